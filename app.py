@@ -1,16 +1,23 @@
 import streamlit as st
 import requests, zipfile, io, xml.etree.ElementTree as ET, pandas as pd, json
-from datetime import datetime
+from datetime import datetime, timedelta
 from pytz import timezone
 from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 import gspread
 from google.oauth2.service_account import Credentials
+from openpyxl import Workbook
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 import time
+import logging
+import os, re, sys, sqlite3, hashlib, threading, bisect, difflib, argparse, queue, itertools, multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dart_doc_parser import DOC_EXEC_FIELDS, parse_exec_table
 
 # --- Google Sheets 인증 ---
 service_account_info = json.loads(st.secrets["SERVICE_ACCOUNT_JSON"])
@@ -25,6 +32,169 @@ jobs_ws = sh.worksheet("DART_Jobs")
 prog_ws = sh.worksheet("DART_Progress")
 
 KST = timezone('Asia/Seoul')
+log = logging.getLogger("dart_monitor")
+
+# --- 로컬 저장소 (SQLite) ---
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".dart_data")
+DB_PATH = os.path.join(DATA_DIR, "dart_monitor.db")
+EXPORT_DIR = os.path.join(DATA_DIR, "exports")
+RESULT_RETENTION_DAYS = 30  # 작업 결과 보관 기간
+
+@contextmanager
+def db_conn():
+    """로컬 SQLite 연결 (호출마다 새 연결, 종료 시 커밋 후 닫기)"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+@st.cache_resource(ttl=24 * 60 * 60)
+def init_db():
+    """로컬 저장소 테이블 생성 및 보관 기간이 지난 결과 정리
+
+    스크립트 재실행마다가 아니라 앱 프로세스당 한 번(이후 하루 한 번) 수행한다.
+    """
+    with db_conn() as conn:
+        conn.executescript("""
+        CREATE TABLE IF NOT EXISTS snapshots (
+            profile_id  TEXT NOT NULL,
+            fp_key      TEXT NOT NULL,
+            career_hash TEXT NOT NULL,
+            corp_code   TEXT,
+            bsns_year   INTEGER,
+            report      TEXT,
+            row_json    TEXT NOT NULL,
+            PRIMARY KEY (profile_id, fp_key)
+        );
+        CREATE TABLE IF NOT EXISTS snapshot_meta (
+            profile_id  TEXT PRIMARY KEY,
+            saved_at    TEXT NOT NULL,
+            row_count   INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS mail_jobs (
+            id              INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_email        TEXT NOT NULL,
+            subject         TEXT NOT NULL,
+            body            TEXT NOT NULL,
+            filename        TEXT,
+            attachment      BLOB,
+            size            INTEGER NOT NULL DEFAULT 0,
+            status          TEXT NOT NULL,
+            attempts        INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error      TEXT,
+            created_at      TEXT NOT NULL,
+            updated_at      TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_mail_jobs_status ON mail_jobs (status, next_attempt_at);
+        CREATE TABLE IF NOT EXISTS profiles (
+            name        TEXT PRIMARY KEY,
+            keywords    TEXT NOT NULL,
+            reports     TEXT NOT NULL,
+            listing     TEXT NOT NULL,
+            corp_codes  TEXT,
+            start_y     INTEGER NOT NULL,
+            end_y       INTEGER NOT NULL,
+            recipient   TEXT NOT NULL,
+            api_key     TEXT NOT NULL,
+            cron        TEXT NOT NULL,
+            enabled     INTEGER NOT NULL DEFAULT 1,
+            watermark   TEXT,
+            last_run    TEXT,
+            last_status TEXT,
+            created_at  TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS results (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id      TEXT NOT NULL,
+            saved_at    TEXT NOT NULL,
+            corp_name   TEXT,
+            stock_code  TEXT,
+            corp_code   TEXT,
+            bsns_year   INTEGER,
+            report      TEXT,
+            nm          TEXT,
+            ofcps       TEXT,
+            main_career TEXT,
+            keywords    TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_job ON results (job_id, id);
+        CREATE INDEX IF NOT EXISTS idx_results_saved ON results (saved_at);
+        CREATE TABLE IF NOT EXISTS delta_rows (
+            job_id      TEXT NOT NULL,
+            fp_key      TEXT NOT NULL,
+            career_hash TEXT NOT NULL,
+            result_id   INTEGER,
+            row_json    TEXT,
+            kind        TEXT,
+            saved_at    TEXT NOT NULL,
+            PRIMARY KEY (job_id, fp_key)
+        );
+        CREATE INDEX IF NOT EXISTS idx_delta_rows_kind ON delta_rows (job_id, kind);
+        CREATE TABLE IF NOT EXISTS job_progress (
+            job_id      TEXT PRIMARY KEY,
+            done        INTEGER NOT NULL,
+            saved_at    TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS failed_targets (
+            job_id      TEXT NOT NULL,
+            corp_code   TEXT NOT NULL,
+            bsns_year   INTEGER NOT NULL,
+            report      TEXT NOT NULL,
+            error       TEXT,
+            saved_at    TEXT NOT NULL,
+            PRIMARY KEY (job_id, corp_code, bsns_year, report)
+        );
+        CREATE TABLE IF NOT EXISTS documents (
+            rcept_no    TEXT NOT NULL,
+            corp_code   TEXT NOT NULL,
+            bsns_year   INTEGER NOT NULL,
+            reprt_code  TEXT NOT NULL,
+            report_nm   TEXT,
+            rcept_dt    TEXT,
+            status      TEXT NOT NULL,
+            exec_count  INTEGER NOT NULL DEFAULT 0,
+            fetched_at  TEXT NOT NULL,
+            PRIMARY KEY (rcept_no, reprt_code)
+        );
+        CREATE INDEX IF NOT EXISTS idx_documents_target ON documents (corp_code, bsns_year, reprt_code);
+        CREATE TABLE IF NOT EXISTS doc_execs (
+            rcept_no    TEXT NOT NULL,
+            corp_code   TEXT NOT NULL,
+            seq         INTEGER NOT NULL,
+            nm          TEXT,
+            sexdstn     TEXT,
+            birth_ym    TEXT,
+            ofcps       TEXT,
+            rgist_exctv_at TEXT,
+            fte_at      TEXT,
+            chrg_job    TEXT,
+            main_career TEXT,
+            mxmm_shrholdr_relate TEXT,
+            hffc_pd     TEXT,
+            tenure_end_on TEXT,
+            PRIMARY KEY (rcept_no, seq)
+        );
+        """)
+        # 오래된 작업 결과 정리
+        cutoff = (datetime.now(KST) - timedelta(days=RESULT_RETENTION_DAYS)).isoformat()
+        conn.execute("DELETE FROM results WHERE saved_at < ?", (cutoff,))
+        conn.execute("DELETE FROM failed_targets WHERE saved_at < ?", (cutoff,))
+        conn.execute("DELETE FROM job_progress WHERE saved_at < ?", (cutoff,))
+        conn.execute("DELETE FROM delta_rows WHERE saved_at < ?", (cutoff,))
+    # 오래된 내보내기 파일 정리
+    if os.path.isdir(EXPORT_DIR):
+        expire = time.time() - RESULT_RETENTION_DAYS * 86400
+        for name in os.listdir(EXPORT_DIR):
+            path = os.path.join(EXPORT_DIR, name)
+            if os.path.getmtime(path) < expire:
+                os.remove(path)
+
+init_db()
 
 # --- API 호출량 관리 ---
 def get_api_usage_info():
@@ -220,6 +390,187 @@ else:
     corp_key = api_key_selected  # 프리셋에서 선택된 키 사용
     st.info(f"✅ 프리셋 API 사용: **{api_presets[selected_index][0]}** (`{corp_key[:8]}...{corp_key[-8:]}`)")
 
+# ---- HTTP 세션+Retry ----
+session = requests.Session()
+session.mount("https://", HTTPAdapter(
+    max_retries=Retry(total=2, backoff_factor=1, status_forcelist=[500,502,503,504])
+))
+
+CORP_LIST_TTL = 6 * 60 * 60  # 회사 목록(corpCode.xml) 캐시 유지 시간
+
+@st.cache_data(ttl=CORP_LIST_TTL, show_spinner=False)
+def _download_corp_list(key):
+    """corpCode.xml 다운로드/파싱 (성공한 결과만 캐시, 실패 시 예외)"""
+    url = "https://opendart.fss.or.kr/api/corpCode.xml"
+    resp = session.get(url, params={"crtfc_key": key}, timeout=30)
+    resp.raise_for_status()
+    if not resp.content.startswith(b"PK"):
+        raise ValueError(ET.fromstring(resp.content).findtext("message", default="알 수 없는 오류"))
+    zf = zipfile.ZipFile(io.BytesIO(resp.content))
+    xml = zf.open(zf.namelist()[0]).read()
+    root = ET.fromstring(xml)
+    out = []
+    for e in root.findall("list"):
+        out.append({
+            "corp_code":  e.findtext("corp_code"),
+            "corp_name":  e.findtext("corp_name"),
+            "stock_code": (e.findtext("stock_code") or "").strip()
+        })
+    return out
+
+def load_corp_list(key):
+    try:
+        return _download_corp_list(key), None
+    except Exception as e:
+        return None, str(e)
+
+def filter_corps(corps, listing):
+    """회사 구분(상장사/비상장사) 필터"""
+    return [
+        c for c in corps
+        if ((c["stock_code"] and "상장사" in listing)
+            or (not c["stock_code"] and "비상장사" in listing))
+    ]
+
+# ---- 회사 검색 인덱스 / 관심 회사 목록 ----
+SCOPE_ALL = "회사 구분 전체"
+SCOPE_WATCHLIST = "지정 회사만 (관심 목록)"
+
+def normalize_corp_name(name):
+    """회사명 정규화: (주)/주식회사/공백 제거, 소문자"""
+    return re.sub(r"\(주\)|㈜|주식회사|\s+", "", name or "").lower()
+
+@st.cache_resource(ttl=CORP_LIST_TTL, show_spinner=False)
+def build_corp_index(key):
+    """캐시된 회사 목록 위에 검색 인덱스 구성 (고유번호/종목코드 정확 일치, 회사명 접두어/유사 검색)"""
+    corps = _download_corp_list(key)
+    by_code, by_stock, by_name, by_initial = {}, {}, {}, {}
+    for c in corps:
+        by_code[c["corp_code"]] = c
+        if c["stock_code"]:
+            by_stock[c["stock_code"]] = c
+        norm = normalize_corp_name(c["corp_name"])
+        by_name.setdefault(norm, []).append(c)
+        if norm:
+            by_initial.setdefault(norm[0], []).append(norm)
+    return {
+        "by_code": by_code,
+        "by_stock": by_stock,
+        "by_name": by_name,
+        "by_initial": by_initial,
+        "names": sorted(by_name),
+    }
+
+def _name_corps(index, norm):
+    # 동명 회사는 상장사를 먼저
+    return sorted(index["by_name"].get(norm, []), key=lambda c: not c["stock_code"])
+
+def search_corps(index, query, limit=20):
+    """회사 검색: 고유번호(8자리)/종목코드(6자리) 정확 일치 → 회사명 정확/접두어/부분/유사 일치 순"""
+    q = query.strip()
+    if not q:
+        return []
+    if q in index["by_code"]:
+        return [index["by_code"][q]]
+    if q in index["by_stock"]:
+        return [index["by_stock"][q]]
+
+    norm = normalize_corp_name(q)
+    if not norm:
+        return []
+    names = index["names"]
+    found = [norm] if norm in index["by_name"] else []
+
+    # 접두어 일치 (정렬된 이름 목록에서 이진 탐색)
+    i = bisect.bisect_left(names, norm)
+    while i < len(names) and names[i].startswith(norm) and len(found) < limit:
+        if names[i] != norm:
+            found.append(names[i])
+        i += 1
+    # 부분 일치
+    if len(found) < limit:
+        for name in names:
+            if norm in name and name not in found:
+                found.append(name)
+                if len(found) >= limit:
+                    break
+    # 유사 일치 (첫 글자가 같은 이름 중에서)
+    if len(found) < limit:
+        for name in difflib.get_close_matches(norm, index["by_initial"].get(norm[0], []), n=limit, cutoff=0.6):
+            if name not in found:
+                found.append(name)
+
+    out = []
+    for name in found:
+        out.extend(_name_corps(index, name))
+    return out[:limit]
+
+def resolve_watchlist(index, tokens):
+    """관심 목록 항목(회사명/종목코드/고유번호) → (회사 목록, 확인 실패 항목)"""
+    corps, unresolved, seen = [], [], set()
+    for token in tokens:
+        t = token.strip()
+        if not t:
+            continue
+        norm = normalize_corp_name(t)
+        if t in index["by_code"]:
+            hit = index["by_code"][t]
+        elif t.zfill(6) in index["by_stock"] and t.isdigit():
+            hit = index["by_stock"][t.zfill(6)]
+        elif norm in index["by_name"]:
+            hit = _name_corps(index, norm)[0]
+        else:
+            candidates = search_corps(index, t, limit=2)
+            # 후보가 하나뿐이거나 매우 유사한 경우만 자동 선택
+            if len(candidates) == 1 or (
+                candidates and difflib.SequenceMatcher(
+                    None, norm, normalize_corp_name(candidates[0]["corp_name"])
+                ).ratio() >= 0.85
+            ):
+                hit = candidates[0]
+            else:
+                unresolved.append(t)
+                continue
+        if hit["corp_code"] not in seen:
+            seen.add(hit["corp_code"])
+            corps.append(hit)
+    return corps, unresolved
+
+@st.cache_data(ttl=CORP_LIST_TTL, max_entries=32, show_spinner=False)
+def cached_resolve_watchlist(key, tokens):
+    """관심 목록 확인 결과 캐시 (목록이 바뀔 때만 다시 확인, tokens는 tuple)"""
+    return resolve_watchlist(build_corp_index(key), tokens)
+
+def read_watchlist_tokens(source, filename):
+    """관심 목록 파일(csv/xlsx/txt) → 항목 목록
+
+    고유번호(corp_code) > 종목코드(stock_code) > 회사명(corp_name) 컬럼 순으로 사용하고,
+    해당 컬럼이 없으면 첫 번째 컬럼을 사용한다.
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".txt":
+        text = source.read() if hasattr(source, "read") else open(source, "rb").read()
+        if isinstance(text, bytes):
+            text = text.decode("utf-8-sig")
+        return [t.strip() for t in re.split(r"[,\n]", text) if t.strip()]
+    if ext in (".xlsx", ".xls"):
+        frame = pd.read_excel(source, dtype=str)
+    else:
+        frame = pd.read_csv(source, dtype=str, encoding="utf-8-sig")
+    for col in ("corp_code", "고유번호", "stock_code", "종목코드", "corp_name", "회사명"):
+        if col in frame.columns:
+            break
+    else:
+        col = frame.columns[0]
+    return [t.strip() for t in frame[col].dropna() if t.strip()]
+
+def parse_cli_args():
+    """명령행 옵션 (예: streamlit run app.py -- --watchlist companies.csv)"""
+    parser = argparse.ArgumentParser(prog="streamlit run app.py --")
+    parser.add_argument("--watchlist", help="관심 회사 목록 파일 (csv/xlsx/txt): 지정 회사만 조회하도록 미리 채움")
+    args, _ = parser.parse_known_args(sys.argv[1:])
+    return args
+
 # ---- 검색 폼 ----
 def focus_email():
     js = """<script>
@@ -232,12 +583,31 @@ def focus_email():
 def is_valid_email(email):
     return "@" in email and "." in email and len(email) > 6
 
-recipient = st.text_input("📧 결과 수신 이메일 (필수)", value="", key="email_input")
+# 입력값은 세션 키로 관리 (저장된 모니터링 프로필 불러오기 시 채워짐)
+cy = datetime.now(KST).year
+st.session_state.setdefault("keywords_input", "이촌,삼정,안진")
+st.session_state.setdefault("reports_input", ["11011"])
+st.session_state.setdefault("listing_input", ["상장사"])
+st.session_state.setdefault("years_input", (cy-1, cy))
+st.session_state.setdefault("scope_input", SCOPE_ALL)
+st.session_state.setdefault("watchlist_input", "")
+
+# 명령행으로 관심 목록 파일이 주어지면 첫 실행 시 지정 회사 모드로 채움
+cli_args = parse_cli_args()
+if cli_args.watchlist and not st.session_state.get("cli_watchlist_loaded"):
+    st.session_state.cli_watchlist_loaded = True
+    try:
+        st.session_state.watchlist_input = "\n".join(read_watchlist_tokens(cli_args.watchlist, cli_args.watchlist))
+        st.session_state.scope_input = SCOPE_WATCHLIST
+    except Exception as e:
+        st.warning(f"관심 목록 파일을 읽지 못했습니다 ({cli_args.watchlist}): {e}", icon="⚠️")
+
+recipient = st.text_input("📧 결과 수신 이메일 (필수)", key="email_input")
 if st.session_state.get("email_required") and not is_valid_email(recipient):
     st.warning("유효한 이메일 주소를 입력하세요.", icon="⚠️")
     focus_email()
 
-keywords = st.text_input("🔍 키워드 (쉼표 구분)", "이촌,삼정,안진")
+keywords = st.text_input("🔍 키워드 (쉼표 구분)", key="keywords_input")
 REPORTS = {
     "11013":"1분기보고서","11012":"반기보고서",
     "11014":"3분기보고서","11011":"사업보고서(연간)"
@@ -245,11 +615,69 @@ REPORTS = {
 sel_reports = st.multiselect(
     "보고서 종류", options=list(REPORTS.keys()),
     format_func=lambda c: f"{REPORTS[c]} ({c})",
-    default=["11011"]
+    key="reports_input"
 )
-listing = st.multiselect("회사 구분", ["상장사","비상장사"], default=["상장사"])
-cy = datetime.now(KST).year
-start_y, end_y = st.slider("사업연도 범위", 2000, cy, (cy-1, cy))
+scope = st.radio("대상 회사 범위", [SCOPE_ALL, SCOPE_WATCHLIST], horizontal=True, key="scope_input")
+watch_corps = None
+if scope == SCOPE_ALL:
+    listing = st.multiselect("회사 구분", ["상장사","비상장사"], key="listing_input")
+else:
+    listing = []
+
+    def add_search_picks():
+        """검색 결과에서 고른 회사를 관심 목록에 추가 (버튼 콜백)"""
+        picks = st.session_state.get("corp_search_picks", [])
+        current = st.session_state.watchlist_input.strip()
+        st.session_state.watchlist_input = "\n".join(filter(None, [current, *(p.split(" | ")[-1] for p in picks)]))
+        st.session_state.corp_search_picks = []
+
+    try:
+        corp_index = build_corp_index(corp_key)
+    except Exception as e:
+        corp_index = None
+        st.error(f"회사 목록 로드 실패: {e}")
+
+    if corp_index:
+        col_search, col_picks = st.columns([1, 2])
+        corp_query = col_search.text_input("🔎 회사 검색 (회사명/종목코드/고유번호)", key="corp_search_input")
+        matches = search_corps(corp_index, corp_query) if corp_query else []
+        col_picks.multiselect(
+            "검색 결과", [f"{c['corp_name']} ({c['stock_code'] or '비상장'}) | {c['corp_code']}" for c in matches],
+            key="corp_search_picks"
+        )
+        col_picks.button("➕ 관심 목록에 추가", key="add_search_picks_btn", on_click=add_search_picks)
+
+        watch_text = st.text_area(
+            "관심 회사 목록 (회사명/종목코드/고유번호, 줄바꿈 또는 쉼표 구분)", key="watchlist_input", height=120
+        )
+        watch_file = st.file_uploader("또는 목록 파일 업로드 (csv/xlsx/txt)", type=["csv", "xlsx", "txt"], key="watchlist_file")
+        tokens = [t for t in re.split(r"[,\n]", watch_text) if t.strip()]
+        if watch_file is not None:
+            try:
+                tokens += read_watchlist_tokens(watch_file, watch_file.name)
+            except Exception as e:
+                st.error(f"목록 파일을 읽지 못했습니다: {e}")
+        watch_corps, unresolved = cached_resolve_watchlist(corp_key, tuple(tokens))
+        st.info(f"✅ 지정 회사 {len(watch_corps):,}개 · 호출 대상은 이 회사들로만 한정됩니다.")
+        if unresolved:
+            st.warning(f"확인되지 않은 항목 {len(unresolved):,}개: {', '.join(unresolved[:20])}"
+                       + (" …" if len(unresolved) > 20 else ""), icon="⚠️")
+    else:
+        watch_corps = []
+start_y, end_y = st.slider("사업연도 범위", 2000, cy, key="years_input")
+delta_only = st.checkbox(
+    "🆕 이전 실행 대비 변경분(신규/변경/삭제)만 메일 발송", value=True,
+    help="같은 키워드·보고서·회사 구분으로 마지막으로 완료된 실행과 비교합니다. 최초 실행은 전체가 신규로 발송됩니다."
+)
+MODE_API = "기업별 API 조회 (exctvSttus)"
+MODE_DOCUMENT = "공시원문 일괄 수집 (document.xml)"
+fetch_mode = st.radio(
+    "조회 방식", [MODE_API, MODE_DOCUMENT], horizontal=True, key="fetch_mode_input",
+    help="공시원문 일괄 수집: 기간 내 정기보고서 원문 ZIP을 한 번씩 내려받아 임원 현황 표를 로컬에 저장합니다. "
+         "이미 수집한 원문은 다시 받지 않으므로, 키워드를 바꿔 다시 조회해도 공시 목록 조회 외에는 API를 거의 쓰지 않습니다."
+)
+
+watch_codes = [c["corp_code"] for c in watch_corps] if watch_corps is not None else None
 
 # ---- 이어받기/복구 UI ----
 jobs_data = jobs_ws.get_all_records()
@@ -286,13 +714,8 @@ if unfinished:
     if st.button("▶️ 이어서 복구/재시작", key="resume_btn"):
         st.session_state.resume_job_id = rj["job_id"]
         st.session_state.resume_data = rj
-        
-        # 이어받기 데이터에 진행 상황 추가
-        if 'resume_progress' in st.session_state:
-            rj['resume_progress'] = st.session_state.resume_progress
-        if 'resume_results' in st.session_state:
-            rj['resume_results'] = st.session_state.resume_results
-            
+        st.session_state.running = True
+        # 진행 위치와 매칭 결과는 작업ID별로 로컬 저장소에 남아 있음 (다른 브라우저 세션에서도 이어받기 가능)
         st.success(f"작업 {rj['job_id']} 복구 준비 완료!")
 
 # ---- 컨트롤 버튼/진행상태 ----
@@ -305,6 +728,9 @@ if run:
         st.session_state.email_required = True
         focus_email()
         st.stop()
+    elif watch_corps is not None and not watch_corps:
+        st.error("관심 목록에서 확인된 회사가 없습니다. 회사명/종목코드/고유번호를 입력하세요.")
+        st.stop()
     else:
         st.session_state.running = True
         st.session_state.email_required = False
@@ -318,34 +744,6 @@ if run:
 if stop:
     st.session_state.running = False
 
-# ---- HTTP 세션+Retry ----
-session = requests.Session()
-session.mount("https://", HTTPAdapter(
-    max_retries=Retry(total=2, backoff_factor=1, status_forcelist=[500,502,503,504])
-))
-
-def load_corp_list(key):
-    url = "https://opendart.fss.or.kr/api/corpCode.xml"
-    try:
-        resp = session.get(url, params={"crtfc_key": key}, timeout=30)
-        resp.raise_for_status()
-        if not resp.content.startswith(b"PK"):
-            err = ET.fromstring(resp.content).findtext("message", default="알 수 없는 오류")
-            return None, err
-        zf = zipfile.ZipFile(io.BytesIO(resp.content))
-        xml = zf.open(zf.namelist()[0]).read()
-        root = ET.fromstring(xml)
-        out = []
-        for e in root.findall("list"):
-            out.append({
-                "corp_code":  e.findtext("corp_code"),
-                "corp_name":  e.findtext("corp_name"),
-                "stock_code": (e.findtext("stock_code") or "").strip()
-            })
-        return out, None
-    except Exception as e:
-        return None, str(e)
-
 def check_api_limit_error(data):
     """API 한도 초과 에러 체크"""
     if isinstance(data, dict):
@@ -356,7 +754,8 @@ def check_api_limit_error(data):
             return True
     return False
 
-def fetch_execs(key, corp_code, year, rpt):
+def fetch_execs(key, corp_code, year, rpt, track_usage=True):
+    """임원 현황 조회 (track_usage=False: 세션이 없는 백그라운드 실행용)"""
     try:
         payload = {
             "crtfc_key": key,
@@ -365,13 +764,14 @@ def fetch_execs(key, corp_code, year, rpt):
             "reprt_code": rpt
         }
         
-        # API 호출 카운트 증가
-        if 'api_call_count' not in st.session_state:
-            st.session_state.api_call_count = 0
-        st.session_state.api_call_count += 1
-        
-        # API 사용량 업데이트
-        update_api_usage(key)
+        if track_usage:
+            # API 호출 카운트 증가
+            if 'api_call_count' not in st.session_state:
+                st.session_state.api_call_count = 0
+            st.session_state.api_call_count += 1
+            
+            # API 사용량 업데이트
+            update_api_usage(key)
         
         response = session.get(
             "https://opendart.fss.or.kr/api/exctvSttus.json",
@@ -384,6 +784,10 @@ def fetch_execs(key, corp_code, year, rpt):
         if check_api_limit_error(data):
             return [], "API_LIMIT_EXCEEDED"
         
+        # 013: 조회된 데이터 없음 (오류가 아니라 임원 현황이 없는 것)
+        if data.get("status") == "013":
+            return [], None
+        
         if data.get("status") != "000":
             return [], data.get("message")
             
@@ -392,94 +796,1249 @@ def fetch_execs(key, corp_code, year, rpt):
     except Exception as e:
         return [], str(e)
 
-# ---- 이메일 발송 함수 ----
-def send_email(to_email, subject, body, attachment_bytes=None, filename=None):
+def match_rows(corp, year, rpt, rows, kws):
+    """임원 현황 중 주요경력에 키워드가 포함된 행 → 결과 행 목록"""
+    out = []
+    for r in rows:
+        mc = r.get("main_career", "")
+        if any(k in mc for k in kws):
+            out.append({
+                "회사명":     corp["corp_name"],
+                "종목코드":   corp["stock_code"] or "비상장",
+                "고유번호":   corp["corp_code"],
+                "사업연도":   year,
+                "보고서종류": REPORTS[rpt],
+                "임원이름":   r.get("nm",""),
+                "직위":       r.get("ofcps",""),
+                "주요경력":   mc,
+                "매칭키워드": ",".join([k for k in kws if k in mc])
+            })
+    return out
+
+FILING_RE = re.compile(r"(사업|반기|분기)보고서\s*\((\d{4})\.(\d{2})\)")
+
+def filing_targets(report_nm):
+    """공시 보고서명 → [(사업연도, 보고서코드)] (예: '사업보고서 (2024.12)' → [(2024, '11011')])"""
+    m = FILING_RE.search(report_nm or "")
+    if not m:
+        return []
+    kind, year, month = m.group(1), int(m.group(2)), int(m.group(3))
+    if kind == "사업":
+        return [(year, "11011")]
+    if kind == "반기":
+        return [(year, "11012")]
+    if month == 3:
+        return [(year, "11013")]
+    if month == 9:
+        return [(year, "11014")]
+    # 결산월이 12월이 아닌 회사는 분기 구분이 모호하므로 둘 다 조회
+    return [(year, "11013"), (year, "11014")]
+
+def fetch_periodic_filings(key, bgn_de, end_de):
+    """기간 내 정기공시(사업/반기/분기보고서) 목록 (회사 미지정 조회는 3개월 단위로 나눠 호출)
+
+    → (공시 목록, 오류, API 호출 수)
+    """
+    filings, calls = [], 0
+    start = datetime.strptime(bgn_de, "%Y%m%d")
+    end = datetime.strptime(end_de, "%Y%m%d")
+    while start <= end:
+        stop = min(end, start + timedelta(days=89))
+        page = 1
+        while True:
+            calls += 1
+            try:
+                resp = session.get(
+                    "https://opendart.fss.or.kr/api/list.json",
+                    params={
+                        "crtfc_key": key, "pblntf_ty": "A",
+                        "bgn_de": start.strftime("%Y%m%d"), "end_de": stop.strftime("%Y%m%d"),
+                        "page_no": page, "page_count": 100
+                    },
+                    timeout=20
+                )
+                data = resp.json()
+            except Exception as e:
+                return None, str(e), calls
+            if check_api_limit_error(data):
+                return None, "API_LIMIT_EXCEEDED", calls
+            if data.get("status") == "013":  # 조회된 데이터 없음
+                break
+            if data.get("status") != "000":
+                return None, data.get("message"), calls
+            filings.extend(data.get("list", []))
+            if page >= int(data.get("total_page", 1)):
+                break
+            page += 1
+        start = stop + timedelta(days=1)
+    return filings, None, calls
+
+# ---- 결과 저장소 / 스트리밍 파이프라인 ----
+# 조회 대상 생성기 → 조회 스레드 → (제한 크기 큐) → 매칭 → 결과 저장소(SQLite) 순으로 흘려보내
+# 작업 크기와 관계없이 메모리에는 큐에 들어 있는 몇 건만 올라간다.
+PIPELINE_QUEUE_SIZE = 32
+RESULT_PAGE_SIZES = [50, 100, 200, 500]
+RESULT_FIELDS = [
+    ("회사명", "corp_name"), ("종목코드", "stock_code"), ("고유번호", "corp_code"),
+    ("사업연도", "bsns_year"), ("보고서종류", "report"), ("임원이름", "nm"),
+    ("직위", "ofcps"), ("주요경력", "main_career"), ("매칭키워드", "keywords"),
+]
+RESULT_HEADERS = [label for label, _ in RESULT_FIELDS]
+_RESULT_COLS = ", ".join(col for _, col in RESULT_FIELDS)
+
+def _result_row(r):
+    """results 테이블 행 → 결과 행 dict (한글 컬럼명)"""
+    return {label: r[col] for label, col in RESULT_FIELDS}
+
+def _save_progress(conn, job_id, done, saved_at):
+    if done is not None:
+        conn.execute(
+            "INSERT OR REPLACE INTO job_progress (job_id, done, saved_at) VALUES (?,?,?)",
+            (job_id, done, saved_at)
+        )
+
+def append_results(job_id, rows, done=None):
+    """매칭 행을 결과 저장소에 바로 기록
+
+    done: 이 대상까지 처리한 건수 (이어받기 위치). 결과와 같은 트랜잭션으로 저장해
+    중단 시점과 무관하게 결과와 진행 위치가 어긋나지 않게 한다.
+    """
+    if not rows and done is None:
+        return
+    saved_at = datetime.now(KST).isoformat()
+    with db_conn() as conn:
+        conn.executemany(
+            f"INSERT INTO results (job_id, saved_at, {_RESULT_COLS}) VALUES (?, ?, {', '.join('?' * len(RESULT_FIELDS))})",
+            [(job_id, saved_at, *(r.get(label) for label, _ in RESULT_FIELDS)) for r in rows]
+        )
+        _save_progress(conn, job_id, done, saved_at)
+
+def record_failed_target(job_id, corp, year, rpt, error, done=None):
+    """조회에 실패한 대상 기록 (변경분 계산 시 이 대상의 이전 결과는 삭제로 보지 않음)"""
+    saved_at = datetime.now(KST).isoformat()
+    with db_conn() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO failed_targets (job_id, corp_code, bsns_year, report, error, saved_at) VALUES (?,?,?,?,?,?)",
+            (job_id, corp["corp_code"], year, REPORTS[rpt], str(error)[:500], saved_at)
+        )
+        _save_progress(conn, job_id, done, saved_at)
+
+def load_job_progress(job_id):
+    """작업의 이어받기 위치 (처리한 조회 대상 수, 기록이 없으면 None)"""
+    with db_conn() as conn:
+        row = conn.execute("SELECT done FROM job_progress WHERE job_id=?", (job_id,)).fetchone()
+    return row["done"] if row else None
+
+def count_results(job_id):
+    with db_conn() as conn:
+        return conn.execute("SELECT COUNT(*) FROM results WHERE job_id=?", (job_id,)).fetchone()[0]
+
+def iter_results(job_id, batch=1000):
+    """작업 결과를 batch 단위로 읽어 한 행씩 반환 (전체를 메모리에 올리지 않음)"""
+    last_id = 0
+    while True:
+        with db_conn() as conn:
+            chunk = conn.execute(
+                f"SELECT id, {_RESULT_COLS} FROM results WHERE job_id=? AND id>? ORDER BY id LIMIT ?",
+                (job_id, last_id, batch)
+            ).fetchall()
+        if not chunk:
+            return
+        for r in chunk:
+            yield _result_row(r)
+        last_id = chunk[-1]["id"]
+
+_KEYWORD_LIKE = "(',' || keywords || ',') LIKE ? ESCAPE '\\'"
+
+def _like_escape(text):
+    """LIKE 패턴에 넣을 사용자 입력의 %, _ 이스케이프 (ESCAPE '\\')"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _result_where(job_id, filters):
+    """결과 필터 → (WHERE 절, 파라미터)"""
+    where, params = ["job_id=?"], [job_id]
+    if filters.get("keywords"):
+        where.append("(" + " OR ".join([_KEYWORD_LIKE] * len(filters["keywords"])) + ")")
+        params += [f"%,{_like_escape(k)},%" for k in filters["keywords"]]
+    company = (filters.get("company") or "").strip()
+    if company:
+        where.append("(corp_name LIKE ? ESCAPE '\\' OR stock_code=? OR corp_code=?)")
+        params += [f"%{_like_escape(company)}%", company, company]
+    for field, col in (("years", "bsns_year"), ("reports", "report")):
+        if filters.get(field):
+            where.append(f"{col} IN ({','.join('?' * len(filters[field]))})")
+            params += list(filters[field])
+    return " AND ".join(where), params
+
+def result_facets(job_id):
+    """필터 선택지: (키워드, 사업연도, 보고서 종류)"""
+    with db_conn() as conn:
+        kw_values = [r[0] for r in conn.execute("SELECT DISTINCT keywords FROM results WHERE job_id=?", (job_id,))]
+        years = [r[0] for r in conn.execute("SELECT DISTINCT bsns_year FROM results WHERE job_id=? ORDER BY 1", (job_id,))]
+        reports = [r[0] for r in conn.execute("SELECT DISTINCT report FROM results WHERE job_id=? ORDER BY 1", (job_id,))]
+    keywords = sorted({k for v in kw_values for k in (v or "").split(",") if k})
+    return keywords, years, reports
+
+def query_results_page(job_id, filters, page, page_size):
+    """필터 조건에 맞는 결과 중 한 페이지만 DataFrame으로 반환"""
+    where, params = _result_where(job_id, filters)
+    with db_conn() as conn:
+        rows = conn.execute(
+            f"SELECT {_RESULT_COLS} FROM results WHERE {where} ORDER BY id LIMIT ? OFFSET ?",
+            (*params, page_size, (page - 1) * page_size)
+        ).fetchall()
+    return pd.DataFrame([{label: r[col] for label, col in RESULT_FIELDS} for r in rows], columns=RESULT_HEADERS)
+
+def result_counts(job_id, filters, keywords):
+    """필터 조건 기준 집계: 전체 건수와 연도/보고서/키워드/회사(상위 10)별 건수"""
+    where, params = _result_where(job_id, filters)
+    with db_conn() as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM results WHERE {where}", params).fetchone()[0]
+        by_year = conn.execute(
+            f"SELECT bsns_year, COUNT(*) FROM results WHERE {where} GROUP BY 1 ORDER BY 1", params
+        ).fetchall()
+        by_report = conn.execute(
+            f"SELECT report, COUNT(*) FROM results WHERE {where} GROUP BY 1 ORDER BY 2 DESC", params
+        ).fetchall()
+        by_corp = conn.execute(
+            f"SELECT corp_name, COUNT(*) FROM results WHERE {where} GROUP BY corp_code ORDER BY 2 DESC LIMIT 10", params
+        ).fetchall()
+        by_keyword = [
+            (k, conn.execute(
+                f"SELECT COUNT(*) FROM results WHERE {where} AND {_KEYWORD_LIKE}", (*params, f"%,{_like_escape(k)},%")
+            ).fetchone()[0])
+            for k in keywords
+        ]
+    return total, {
+        "사업연도별": pd.DataFrame(by_year, columns=["사업연도", "건수"]),
+        "보고서별": pd.DataFrame(by_report, columns=["보고서종류", "건수"]),
+        "키워드별": pd.DataFrame(by_keyword, columns=["키워드", "건수"]),
+        "회사별 (상위 10)": pd.DataFrame(by_corp, columns=["회사명", "건수"]),
+    }
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_result_facets(job_id, row_count):
+    """필터 선택지 캐시 (결과 행 수가 바뀔 때만 다시 조회)"""
+    return result_facets(job_id)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_result_counts(job_id, row_count, filter_items, keywords):
+    """필터별 집계 캐시 (filter_items: (필드, 값) tuple) - 페이지만 넘길 때는 다시 집계하지 않음"""
+    return result_counts(job_id, dict(filter_items), list(keywords))
+
+def render_results_view(job_id, key):
+    """결과 보기: 필터·집계·페이지 나누기를 저장소(SQLite)에서 처리하고 현재 페이지만 화면에 전송"""
+    row_count = count_results(job_id)
+    keyword_opts, year_opts, report_opts = cached_result_facets(job_id, row_count)
+    col_kw, col_corp, col_year, col_rpt = st.columns([1.2, 1.2, 1, 1])
+    filters = {
+        "keywords": col_kw.multiselect("키워드", keyword_opts, key=f"{key}_kw"),
+        "company": col_corp.text_input("회사명/종목코드/고유번호", key=f"{key}_corp"),
+        "years": col_year.multiselect("사업연도", year_opts, key=f"{key}_year"),
+        "reports": col_rpt.multiselect("보고서 종류", report_opts, key=f"{key}_rpt"),
+    }
+    filter_items = tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in filters.items())
+    total, counts = cached_result_counts(job_id, row_count, filter_items, tuple(filters["keywords"] or keyword_opts))
+
+    with st.expander(f"📈 집계 (필터 적용 {total:,}건)"):
+        for col, (title, frame) in zip(st.columns(len(counts)), counts.items()):
+            col.markdown(f"**{title}**")
+            col.dataframe(frame, use_container_width=True, hide_index=True)
+
+    col_size, col_page, col_info = st.columns([1, 1, 2])
+    page_size = col_size.selectbox("페이지당 행 수", RESULT_PAGE_SIZES, index=1, key=f"{key}_size")
+    pages = max(1, -(-total // page_size))
+    # 필터가 바뀌어 페이지 수가 줄면 마지막 페이지로
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = col_page.number_input("페이지", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    col_info.markdown(
+        f"<div style='padding-top:32px;color:#666;'>{total:,}건 중 "
+        f"{min(total, (page - 1) * page_size + 1):,}–{min(total, page * page_size):,}건 ({page:,}/{pages:,} 페이지)</div>",
+        unsafe_allow_html=True
+    )
+    st.dataframe(query_results_page(job_id, filters, page, page_size), use_container_width=True, hide_index=True)
+
+def clear_results(job_id):
+    with db_conn() as conn:
+        conn.execute("DELETE FROM results WHERE job_id=?", (job_id,))
+        conn.execute("DELETE FROM failed_targets WHERE job_id=?", (job_id,))
+        conn.execute("DELETE FROM job_progress WHERE job_id=?", (job_id,))
+        conn.execute("DELETE FROM delta_rows WHERE job_id=?", (job_id,))
+    _remove_exports(job_id)
+
+def write_results_xlsx(target, rows, sheet_name="DART_Results", headers=RESULT_HEADERS):
+    """결과 행을 한 줄씩 XLSX로 기록 (openpyxl write-only 모드, target: 파일 경로 또는 파일 객체)"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append(headers)
+    for r in rows:
+        ws.append([r.get(h, "") for h in headers])
+    wb.save(target)
+
+def export_results_xlsx(rows, sheet_name="DART_Results", headers=RESULT_HEADERS):
+    """결과 행 → XLSX 바이트 (메일 첨부용)"""
+    buf = io.BytesIO()
+    write_results_xlsx(buf, rows, sheet_name, headers)
+    return buf.getvalue()
+
+def _remove_exports(job_id, keep=None):
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    prefix = f"dart_results_{job_id}_"
+    for name in os.listdir(EXPORT_DIR):
+        if name.startswith(prefix) and name != keep:
+            os.remove(os.path.join(EXPORT_DIR, name))
+
+def export_results_path(job_id, row_count):
+    return os.path.join(EXPORT_DIR, f"dart_results_{job_id}_{row_count}.xlsx")
+
+def export_results_file(job_id, row_count):
+    """작업 결과 XLSX 파일 경로 (결과 건수가 바뀔 때만 다시 생성, 메모리 대신 디스크에 보관)"""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    path = export_results_path(job_id, row_count)
+    name = os.path.basename(path)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        write_results_xlsx(tmp_path, iter_results(job_id))
+        os.replace(tmp_path, path)
+        _remove_exports(job_id, keep=name)
+    return path
+
+def read_export(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def render_export_download(job_id, row_count, label, key):
+    """XLSX 다운로드 버튼 (파일은 '파일 준비'를 누를 때만 생성, 이미 만든 파일은 바로 다운로드)"""
+    path = export_results_path(job_id, row_count)
+    if not os.path.exists(path):
+        if not st.button("📦 XLSX 파일 준비", key=f"{key}_prepare",
+                         help=f"{row_count:,}건을 파일로 만듭니다. 결과가 많으면 시간이 걸릴 수 있습니다."):
+            return
+        with st.spinner("XLSX 파일 생성 중…"):
+            export_results_file(job_id, row_count)
+    with open(path, "rb") as f:
+        st.download_button(
+            label,
+            data=f,
+            file_name=f"dart_results_{job_id}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key=key
+        )
+
+def iter_targets(corps, years, reports, start_index=0):
+    """(회사, 연도, 보고서) 조회 대상을 필요할 때마다 하나씩 생성"""
+    targets = ((c, y, r) for c in corps for y in years for r in reports)
+    return itertools.islice(targets, start_index, None)
+
+def _queue_put(q, item, stop_event):
+    # 큐가 가득 차면 소비자가 꺼낼 때까지 대기 (중지 신호가 오면 포기)
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def stream_fetch_results(key, targets, stop_event=None):
+    """조회 대상을 백그라운드 스레드에서 조회해 (corp, year, rpt, rows, err)를 순서대로 반환
+
+    큐 크기(PIPELINE_QUEUE_SIZE)만큼만 앞서 조회하고, 소비가 늦으면 조회도 멈춘다.
+    소비자가 반복을 중단하면 조회 스레드도 멈춘다.
+    """
+    stop_event = stop_event or threading.Event()
+    out = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    done = object()
+
+    def fetcher():
+        try:
+            for corp, y, rpt in targets:
+                if stop_event.is_set():
+                    break
+                rows, err = fetch_execs(key, corp["corp_code"], y, rpt, track_usage=False)
+                if not _queue_put(out, (corp, y, rpt, rows, err), stop_event):
+                    break
+                if err == "API_LIMIT_EXCEEDED":
+                    break
+                # API 호출 제한 준수
+                time.sleep(0.05)
+        finally:
+            _queue_put(out, done, stop_event)
+
+    threading.Thread(target=fetcher, daemon=True, name="dart-fetcher").start()
     try:
-        from_email = st.secrets["smtp"]["sender_email"]
-        from_pwd   = st.secrets["smtp"]["sender_password"]
-        
-        msg = MIMEMultipart()
-        msg['From'] = from_email
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, "plain", 'utf-8'))
-        
-        if attachment_bytes and filename:
-            part = MIMEApplication(attachment_bytes)
-            part.add_header('Content-Disposition', 'attachment', filename=filename)
-            msg.attach(part)
-        
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-            server.login(from_email, from_pwd)
-            server.send_message(msg)
-        
-        return True, "메일 발송 성공"
+        while True:
+            item = out.get()
+            if item is done:
+                return
+            yield item
+    finally:
+        stop_event.set()
+
+# ---- 공시원문(document.xml) 일괄 수집 ----
+# 기간 내 정기보고서 원문 ZIP을 한 번 받아 임원 현황 표를 로컬에서 추출해 두면,
+# 이후 키워드가 바뀌어도 추가 API 호출 없이 저장된 표에서 바로 매칭한다.
+DOC_DOWNLOAD_WORKERS = 4
+DOC_PARSE_WORKERS = max(1, min(4, os.cpu_count() or 1))
+DOC_BATCH_SIZE = 32
+_DOC_EXEC_COLS = ", ".join(col for _, col in DOC_EXEC_FIELDS)
+
+def fetch_document_zip(key, rcept_no):
+    """공시원문 ZIP 다운로드 → (bytes, 오류)"""
+    try:
+        resp = session.get(
+            "https://opendart.fss.or.kr/api/document.xml",
+            params={"crtfc_key": key, "rcept_no": rcept_no}, timeout=60
+        )
+        resp.raise_for_status()
+        if not resp.content.startswith(b"PK"):
+            root = ET.fromstring(resp.content)
+            data = {"status": root.findtext("status"), "message": root.findtext("message", default="")}
+            if check_api_limit_error(data):
+                return None, "API_LIMIT_EXCEEDED"
+            return None, data["message"] or "알 수 없는 오류"
+        return resp.content, None
+    except Exception as e:
+        return None, str(e)
+
+def _parse_executor():
+    # 파싱은 CPU 작업이라 프로세스 풀 사용 (파서는 별도 모듈이라 모듈 경로로 pickle됨).
+    # spawn/forkserver는 자식에서 __main__(이 스크립트)을 다시 실행하므로 fork만 사용하고,
+    # fork를 쓸 수 없는 환경이면 스레드 풀
+    try:
+        return ProcessPoolExecutor(max_workers=DOC_PARSE_WORKERS, mp_context=multiprocessing.get_context("fork"))
+    except ValueError:
+        return ThreadPoolExecutor(max_workers=DOC_PARSE_WORKERS)
+
+def store_document(filing, targets, status, rows=()):
+    """원문 1건의 임원 현황 저장 (targets: 이 원문이 해당하는 [(사업연도, 보고서코드)])"""
+    fetched_at = datetime.now(KST).isoformat()
+    with db_conn() as conn:
+        conn.execute("DELETE FROM doc_execs WHERE rcept_no=?", (filing["rcept_no"],))
+        conn.executemany(
+            f"INSERT INTO doc_execs (rcept_no, corp_code, seq, {_DOC_EXEC_COLS}) "
+            f"VALUES (?, ?, ?, {', '.join('?' * len(DOC_EXEC_FIELDS))})",
+            [(filing["rcept_no"], filing["corp_code"], seq, *(r.get(col) for _, col in DOC_EXEC_FIELDS))
+             for seq, r in enumerate(rows)]
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO documents (rcept_no, corp_code, bsns_year, reprt_code, report_nm, rcept_dt, status, exec_count, fetched_at) "
+            "VALUES (?,?,?,?,?,?,?,?,?)",
+            [(filing["rcept_no"], filing["corp_code"], year, rpt, filing.get("report_nm"), filing.get("rcept_dt"),
+              status, len(rows), fetched_at) for year, rpt in targets]
+        )
+
+def ingest_documents(key, pending, on_progress=None):
+    """공시원문 일괄 다운로드 → 병렬 파싱 → 로컬 저장
+
+    pending: [(filing, [(사업연도, 보고서코드) …])] → (다운로드 호출 수, 오류)
+    메모리에 올라가는 ZIP은 DOC_BATCH_SIZE건씩으로 제한한다.
+    """
+    calls = 0
+    with ThreadPoolExecutor(max_workers=DOC_DOWNLOAD_WORKERS) as dl_pool, _parse_executor() as parse_pool:
+        for start in range(0, len(pending), DOC_BATCH_SIZE):
+            batch = pending[start:start + DOC_BATCH_SIZE]
+            downloads = list(dl_pool.map(lambda item: fetch_document_zip(key, item[0]["rcept_no"]), batch))
+            calls += len(downloads)
+            # 한도 초과여도 이 배치에서 이미 받은 원문은 저장한 뒤 중단 (이어받기 시 다시 받지 않도록)
+            limit_hit = any(err == "API_LIMIT_EXCEEDED" for _, err in downloads)
+
+            for (filing, _), (data, err) in zip(batch, downloads):
+                if err and err != "API_LIMIT_EXCEEDED":
+                    log.warning("공시원문 다운로드 실패 %s: %s", filing["rcept_no"], err)
+            parses = {
+                parse_pool.submit(parse_exec_table, data): (item, data)
+                for item, (data, err) in zip(batch, downloads) if data
+            }
+            for fut in as_completed(parses):
+                (filing, targets), data = parses[fut]
+                try:
+                    try:
+                        rows = fut.result()
+                    except BrokenProcessPool:
+                        # 파싱 프로세스가 죽은 경우(문서 문제가 아님): 여기서 직접 파싱
+                        rows = parse_exec_table(data)
+                except Exception:
+                    # 손상된 원문 등: 다시 받지 않도록 실패 상태로 기록 (조회 시 해당 대상은 조회 실패로 처리)
+                    log.exception("공시원문 파싱 실패: %s", filing["rcept_no"])
+                    store_document(filing, targets, "parse_failed")
+                    continue
+                store_document(filing, targets, "parsed" if rows else "no_table", rows)
+            if limit_hit:
+                return calls, "API_LIMIT_EXCEEDED"
+            if on_progress:
+                on_progress(min(start + DOC_BATCH_SIZE, len(pending)), len(pending))
+    return calls, None
+
+def prepare_document_targets(key, corps, years, reports, on_progress=None):
+    """기간 내 정기보고서 원문을 수집하고 조회 대상 [(회사, 연도, 보고서)] 반환
+
+    → (대상 목록, API 호출 수, 오류). 이미 수집한 원문(접수번호 기준)은 다시 받지 않는다.
+    """
+    corp_map = {c["corp_code"]: c for c in corps}
+    today = datetime.now(KST).strftime("%Y%m%d")
+    bgn_de = f"{min(years)}0101"
+    end_de = min(today, f"{max(years) + 1}1231")
+    filings, err, calls = fetch_periodic_filings(key, bgn_de, end_de)
+    if err:
+        return [], calls, err
+
+    # (회사, 연도, 보고서)별 최신 접수번호 (정정 공시가 있으면 나중 것).
+    # 결산월이 12월이 아닌 회사의 분기보고서는 1·3분기 모두에 대응시킨다 (filing_targets, 예약 실행과 동일)
+    latest = {}
+    for f in filings:
+        if f.get("corp_code") not in corp_map:
+            continue
+        for y, r in filing_targets(f.get("report_nm")):
+            if y in years and r in reports:
+                k = (f["corp_code"], y, r)
+                if k not in latest or f["rcept_no"] > latest[k]["rcept_no"]:
+                    latest[k] = f
+
+    # 아직 수집하지 않은 원문만 접수번호별로 한 번씩 다운로드
+    with db_conn() as conn:
+        done = {(r["rcept_no"], r["reprt_code"]) for r in conn.execute("SELECT rcept_no, reprt_code FROM documents")}
+    pending = {}
+    for (code, y, r), f in sorted(latest.items()):
+        if (f["rcept_no"], r) not in done:
+            pending.setdefault(f["rcept_no"], (f, []))[1].append((y, r))
+    dl_calls, err = ingest_documents(key, list(pending.values()), on_progress)
+    targets = [(corp_map[code], y, r) for code, y, r in sorted(latest)]
+    return targets, calls + dl_calls, err
+
+def stream_document_results(targets):
+    """수집된 원문의 임원 현황을 (corp, year, rpt, rows, err) 형태로 반환 (API 호출 없음)"""
+    for corp, y, rpt in targets:
+        with db_conn() as conn:
+            doc = conn.execute(
+                "SELECT rcept_no, status FROM documents WHERE corp_code=? AND bsns_year=? AND reprt_code=? "
+                "ORDER BY rcept_no DESC LIMIT 1",
+                (corp["corp_code"], y, rpt)
+            ).fetchone()
+            rows = [dict(r) for r in conn.execute(
+                f"SELECT {_DOC_EXEC_COLS} FROM doc_execs WHERE rcept_no=? ORDER BY seq", (doc["rcept_no"],)
+            )] if doc else None
+        if rows is None:
+            yield corp, y, rpt, [], "원문 미수집"
+        elif doc["status"] == "parse_failed":
+            yield corp, y, rpt, [], "원문 파싱 실패"
+        else:
+            yield corp, y, rpt, rows, None
+
+# ---- 이메일 발송 큐 (백그라운드 발송 + 재시도) ----
+MAIL_ATTACH_LIMIT = 18 * 1024 * 1024   # Gmail 25MB 한도 (base64 인코딩 시 약 1.37배 증가)
+MAIL_MAX_ATTEMPTS = 5
+MAIL_RETRY_BASE = 30                   # 재시도 대기(초): 30, 60, 120, 240 …
+MAIL_POLL_INTERVAL = 10
+MAIL_IDLE_CLOSE = 60                   # 대기열이 비고 60초 지나면 SMTP 연결 종료
+LOOP_ERROR_SLEEP = 5                   # 백그라운드 루프 오류(DB 잠김 등) 후 대기(초)
+MAIL_STATUS_LABELS = {"pending": "대기", "sending": "발송 중", "sent": "발송 완료", "failed": "실패"}
+
+def build_mail_message(from_email, to_email, subject, body, attachment_bytes=None, filename=None):
+    msg = MIMEMultipart()
+    msg['From'] = from_email
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, "plain", 'utf-8'))
+    
+    if attachment_bytes and filename:
+        part = MIMEApplication(attachment_bytes)
+        part.add_header('Content-Disposition', 'attachment', filename=filename)
+        msg.attach(part)
+    return msg
+
+def prepare_attachments(attachment_bytes, filename):
+    """첨부 크기 관리: 한도 초과 시 zip 압축, 그래도 크면 분할(.zip.001, .zip.002 …)"""
+    if not attachment_bytes or not filename:
+        return [(None, None)]
+    if len(attachment_bytes) <= MAIL_ATTACH_LIMIT:
+        return [(attachment_bytes, filename)]
+    
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED, compresslevel=9) as zf:
+        zf.writestr(filename, attachment_bytes)
+    zipped = buf.getvalue()
+    zip_name = os.path.splitext(filename)[0] + ".zip"
+    if len(zipped) <= MAIL_ATTACH_LIMIT:
+        return [(zipped, zip_name)]
+    
+    # 분할 압축 (7-Zip 등에서 .001 파일을 열면 자동 병합)
+    chunks = [zipped[i:i + MAIL_ATTACH_LIMIT] for i in range(0, len(zipped), MAIL_ATTACH_LIMIT)]
+    return [(chunk, f"{zip_name}.{n:03d}") for n, chunk in enumerate(chunks, 1)]
+
+def enqueue_email(to_email, subject, body, attachment_bytes=None, filename=None):
+    """메일 발송 대기열에 등록 (첨부가 크면 압축/분할) → 등록된 작업 ID 목록"""
+    parts = prepare_attachments(attachment_bytes, filename)
+    now = datetime.now(KST).isoformat()
+    job_ids = []
+    with db_conn() as conn:
+        for n, (data, name) in enumerate(parts, 1):
+            part_subject, part_body = subject, body
+            if len(parts) > 1:
+                part_subject = f"{subject} [첨부 {n}/{len(parts)}]"
+                part_body = body + f"\n※ 첨부 용량이 커서 {len(parts)}개로 분할 발송합니다. 모두 받은 뒤 .001 파일을 7-Zip 등으로 열어주세요.\n"
+            cur = conn.execute(
+                "INSERT INTO mail_jobs (to_email, subject, body, filename, attachment, size, status, attempts, next_attempt_at, created_at, updated_at) "
+                "VALUES (?,?,?,?,?,?,'pending',0,0,?,?)",
+                (to_email, part_subject, part_body, name, data, len(data) if data else 0, now, now)
+            )
+            job_ids.append(cur.lastrowid)
+    if mail_wake is not None:
+        mail_wake.set()
+    return job_ids
+
+def claim_next_mail_job():
+    """발송 가능한 대기 작업 하나를 '발송 중'으로 가져오기"""
+    with db_conn() as conn:
+        row = conn.execute(
+            "SELECT * FROM mail_jobs WHERE status='pending' AND next_attempt_at<=? ORDER BY id LIMIT 1",
+            (time.time(),)
+        ).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE mail_jobs SET status='sending', updated_at=? WHERE id=?",
+                (datetime.now(KST).isoformat(), row["id"])
+            )
+    return row
+
+def finish_mail_job(job, error=None):
+    """발송 결과 기록 (실패 시 지수 백오프로 재시도 예약, 한도 도달 시 실패 처리)"""
+    now = datetime.now(KST).isoformat()
+    with db_conn() as conn:
+        if error is None:
+            conn.execute(
+                "UPDATE mail_jobs SET status='sent', attempts=attempts+1, attachment=NULL, last_error=NULL, updated_at=? WHERE id=?",
+                (now, job["id"])
+            )
+            return
+        attempts = job["attempts"] + 1
+        status = "failed" if attempts >= MAIL_MAX_ATTEMPTS else "pending"
+        conn.execute(
+            "UPDATE mail_jobs SET status=?, attempts=?, next_attempt_at=?, last_error=?, updated_at=? WHERE id=?",
+            (status, attempts, time.time() + MAIL_RETRY_BASE * 2 ** (attempts - 1), str(error)[:500], now, job["id"])
+        )
+
+def retry_failed_mail_jobs():
+    """실패한 메일 작업을 다시 대기열로"""
+    with db_conn() as conn:
+        conn.execute(
+            "UPDATE mail_jobs SET status='pending', attempts=0, next_attempt_at=0, updated_at=? WHERE status='failed'",
+            (datetime.now(KST).isoformat(),)
+        )
+    if mail_wake is not None:
+        mail_wake.set()
+
+def mail_worker_loop(from_email, from_pwd, wake):
+    """대기열을 순서대로 발송하는 백그라운드 루프 (SMTP 연결 재사용)
+
+    DB 오류(database is locked 등)가 나도 스레드가 죽지 않도록 반복마다 예외를 잡고,
+    기록하지 못한 발송 결과는 다음 반복에서 다시 기록한다.
+    """
+    server = None
+    idle_since = time.time()
+    unfinished = None  # (작업, 오류) – 발송은 끝났지만 DB에 기록하지 못한 결과
+    while True:
+        try:
+            if unfinished is not None:
+                finish_mail_job(*unfinished)
+                unfinished = None
+            
+            job = claim_next_mail_job()
+            if job is None:
+                if server is not None and time.time() - idle_since > MAIL_IDLE_CLOSE:
+                    try:
+                        server.quit()
+                    except Exception:
+                        pass
+                    server = None
+                wake.wait(MAIL_POLL_INTERVAL)
+                wake.clear()
+                continue
+            
+            error = None
+            try:
+                if server is not None:
+                    try:
+                        server.noop()
+                    except Exception:
+                        server = None
+                if server is None:
+                    server = smtplib.SMTP_SSL('smtp.gmail.com', 465, timeout=30)
+                    server.login(from_email, from_pwd)
+                server.send_message(build_mail_message(
+                    from_email, job["to_email"], job["subject"], job["body"], job["attachment"], job["filename"]
+                ))
+            except Exception as e:
+                try:
+                    server.close()
+                except Exception:
+                    pass
+                server = None
+                error = e
+            unfinished = (job, error)
+            finish_mail_job(job, error)
+            unfinished = None
+            idle_since = time.time()
+        except Exception:
+            log.exception("메일 발송 루프 오류 (%s초 후 재시도)", LOOP_ERROR_SLEEP)
+            time.sleep(LOOP_ERROR_SLEEP)
+
+@st.cache_resource
+def start_mail_worker(from_email, from_pwd):
+    """메일 발송 스레드 시작 (앱 프로세스당 1개)"""
+    # 이전 프로세스에서 발송 중 중단된 작업 복구
+    with db_conn() as conn:
+        conn.execute("UPDATE mail_jobs SET status='pending' WHERE status='sending'")
+    wake = threading.Event()
+    threading.Thread(
+        target=mail_worker_loop, args=(from_email, from_pwd, wake),
+        daemon=True, name="dart-mail-worker"
+    ).start()
+    return wake
+
+try:
+    mail_wake = start_mail_worker(st.secrets["smtp"]["sender_email"], st.secrets["smtp"]["sender_password"])
+except Exception as e:
+    mail_wake = None
+    st.warning(f"메일 발송 설정 오류로 발송 대기열이 멈춰 있습니다: {e}", icon="⚠️")
+
+def mail_status_frame(limit=20):
+    """최근 메일 작업 상태 DataFrame"""
+    with db_conn() as conn:
+        rows = conn.execute(
+            "SELECT id, to_email, subject, filename, size, status, attempts, last_error, updated_at "
+            "FROM mail_jobs ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+    return pd.DataFrame([{
+        "작업": r["id"],
+        "수신": r["to_email"],
+        "제목": r["subject"],
+        "첨부": r["filename"] or "",
+        "크기(KB)": round((r["size"] or 0) / 1024, 1),
+        "상태": MAIL_STATUS_LABELS.get(r["status"], r["status"]),
+        "시도": r["attempts"],
+        "오류": r["last_error"] or "",
+        "갱신": r["updated_at"],
+    } for r in rows])
+
+# ---- 결과 스냅샷/변경분(Delta) 관리 ----
+DELTA_LABELS = {"new": "신규", "changed": "변경", "removed": "삭제"}
+DELTA_HEADERS = ["변경구분", *RESULT_HEADERS]
+
+def make_profile_id(kws, reports, listing, corp_codes=None, document_mode=False):
+    """키워드 프로필(키워드+보고서 종류+회사 구분/지정 회사+조회 방식) 식별자
+
+    원문 수집 방식은 주요경력 텍스트가 API 응답과 달라 스냅샷을 따로 둔다.
+    """
+    parts = [sorted(kws), sorted(reports), sorted(listing)]
+    if corp_codes:
+        parts.append(sorted(corp_codes))
+    if document_mode:
+        parts.append("document")
+    raw = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+def fingerprint_row(row):
+    """매칭 행 지문: (회사코드·연도·보고서·임원명 식별키, 주요경력 해시)"""
+    ident = "|".join(str(row.get(k, "")) for k in ("고유번호", "사업연도", "보고서종류", "임원이름"))
+    fp_key = hashlib.sha1(ident.encode("utf-8")).hexdigest()
+    career_hash = hashlib.sha1(str(row.get("주요경력", "")).encode("utf-8")).hexdigest()
+    return fp_key, career_hash
+
+def diff_against_snapshot(profile_id, job_id, years, partial=False, scope=None):
+    """이전 실행 스냅샷 대비 신규/변경/삭제 행 계산 → ({구분: 건수}, 이전 스냅샷 존재 여부)
+
+    작업 결과의 지문을 delta_rows에 적재해 스냅샷과 SQL로 비교하므로 결과 크기와
+    관계없이 메모리 사용량이 일정하다. partial=True면 삭제 판정 생략, scope가 주어지면
+    그 안의 (고유번호, 사업연도, 보고서종류)에 대해서만 삭제 판정 (증분 실행용).
+    이 작업에서 조회에 실패한 대상(failed_targets)은 삭제 판정에서 제외한다.
+    """
+    now = datetime.now(KST).isoformat()
+    years = list(years)
+    with db_conn() as conn:
+        conn.execute("DELETE FROM delta_rows WHERE job_id=?", (job_id,))
+        # 결과 지문 적재 (같은 지문은 처음 행만)
+        cur = conn.execute(f"SELECT id, {_RESULT_COLS} FROM results WHERE job_id=? ORDER BY id", (job_id,))
+        while True:
+            chunk = cur.fetchmany(1000)
+            if not chunk:
+                break
+            conn.executemany(
+                "INSERT OR IGNORE INTO delta_rows (job_id, fp_key, career_hash, result_id, saved_at) VALUES (?,?,?,?,?)",
+                [(job_id, *fingerprint_row(_result_row(r)), r["id"], now) for r in chunk]
+            )
+
+        conn.execute(
+            "UPDATE delta_rows SET kind='new' WHERE job_id=? AND NOT EXISTS "
+            "(SELECT 1 FROM snapshots s WHERE s.profile_id=? AND s.fp_key=delta_rows.fp_key)",
+            (job_id, profile_id)
+        )
+        conn.execute(
+            "UPDATE delta_rows SET kind='changed' WHERE job_id=? AND EXISTS "
+            "(SELECT 1 FROM snapshots s WHERE s.profile_id=? AND s.fp_key=delta_rows.fp_key "
+            "AND s.career_hash!=delta_rows.career_hash)",
+            (job_id, profile_id)
+        )
+
+        if not partial and years:
+            scope_sql = ""
+            if scope is not None:
+                conn.execute("CREATE TEMP TABLE diff_scope (corp_code TEXT, bsns_year INTEGER, report TEXT)")
+                conn.executemany("INSERT INTO diff_scope VALUES (?,?,?)", scope)
+                scope_sql = ("AND EXISTS (SELECT 1 FROM diff_scope t WHERE t.corp_code=s.corp_code "
+                             "AND t.bsns_year=s.bsns_year AND t.report=s.report)")
+            conn.execute(
+                f"""
+                INSERT INTO delta_rows (job_id, fp_key, career_hash, row_json, kind, saved_at)
+                SELECT ?, s.fp_key, s.career_hash, s.row_json, 'removed', ?
+                FROM snapshots s
+                WHERE s.profile_id=? AND s.bsns_year IN ({','.join('?' * len(years))})
+                  AND NOT EXISTS (SELECT 1 FROM delta_rows d WHERE d.job_id=? AND d.fp_key=s.fp_key)
+                  AND NOT EXISTS (SELECT 1 FROM failed_targets f WHERE f.job_id=? AND f.corp_code=s.corp_code
+                                  AND f.bsns_year=s.bsns_year AND f.report=s.report)
+                  {scope_sql}
+                """,
+                (job_id, now, profile_id, *years, job_id, job_id)
+            )
+
+        counts = dict.fromkeys(DELTA_LABELS, 0)
+        counts.update(conn.execute(
+            "SELECT kind, COUNT(*) FROM delta_rows WHERE job_id=? AND kind IS NOT NULL GROUP BY kind", (job_id,)
+        ).fetchall())
+        has_baseline = conn.execute(
+            "SELECT 1 FROM snapshot_meta WHERE profile_id=?", (profile_id,)
+        ).fetchone() is not None
+    return counts, has_baseline
+
+def save_snapshot(profile_id, job_id):
+    """diff_against_snapshot으로 비교한 작업 결과를 프로필 스냅샷으로 저장
+
+    삭제로 판정된 행만 지운 뒤 이번 결과를 덮어쓴다. 조회에 실패한 대상의
+    이전 행은 삭제 판정에서 빠지므로 다음 실행까지 그대로 남는다.
+    """
+    with db_conn() as conn:
+        conn.execute(
+            "DELETE FROM snapshots WHERE profile_id=? AND fp_key IN "
+            "(SELECT fp_key FROM delta_rows WHERE job_id=? AND kind='removed')",
+            (profile_id, job_id)
+        )
+        cur = conn.execute(
+            f"SELECT d.fp_key, d.career_hash, {', '.join('r.' + col for _, col in RESULT_FIELDS)} "
+            "FROM delta_rows d JOIN results r ON r.id=d.result_id WHERE d.job_id=? ORDER BY d.result_id",
+            (job_id,)
+        )
+        while True:
+            chunk = cur.fetchmany(1000)
+            if not chunk:
+                break
+            conn.executemany(
+                "INSERT OR REPLACE INTO snapshots (profile_id, fp_key, career_hash, corp_code, bsns_year, report, row_json) "
+                "VALUES (?,?,?,?,?,?,?)",
+                [
+                    (profile_id, r["fp_key"], r["career_hash"], r["corp_code"], r["bsns_year"], r["report"],
+                     json.dumps(_result_row(r), ensure_ascii=False))
+                    for r in chunk
+                ]
+            )
+        count = conn.execute(
+            "SELECT COUNT(*) FROM snapshots WHERE profile_id=?", (profile_id,)
+        ).fetchone()[0]
+        conn.execute(
+            "INSERT OR REPLACE INTO snapshot_meta (profile_id, saved_at, row_count) VALUES (?,?,?)",
+            (profile_id, datetime.now(KST).isoformat(), count)
+        )
+
+def iter_delta_rows(job_id, batch=1000):
+    """변경분 행을 신규/변경/삭제 순으로 '변경구분' 컬럼을 붙여 한 행씩 반환"""
+    for kind in ("new", "changed", "removed"):
+        last_rowid = 0
+        while True:
+            with db_conn() as conn:
+                chunk = conn.execute(
+                    f"SELECT d.rowid AS rid, d.row_json, {', '.join('r.' + col for _, col in RESULT_FIELDS)} "
+                    "FROM delta_rows d LEFT JOIN results r ON r.id=d.result_id "
+                    "WHERE d.job_id=? AND d.kind=? AND d.rowid>? ORDER BY d.rowid LIMIT ?",
+                    (job_id, kind, last_rowid, batch)
+                ).fetchall()
+            if not chunk:
+                break
+            for r in chunk:
+                row = json.loads(r["row_json"]) if r["row_json"] else _result_row(r)
+                yield {"변경구분": DELTA_LABELS[kind], **row}
+            last_rowid = chunk[-1]["rid"]
+
+def export_delta_xlsx(job_id):
+    """변경분 XLSX 바이트 (메일 첨부용, 저장소에서 한 행씩 기록)"""
+    return export_results_xlsx(iter_delta_rows(job_id), sheet_name="DART_Delta", headers=DELTA_HEADERS)
+
+def delta_summary(delta):
+    return " · ".join(f"{DELTA_LABELS[k]} {delta[k]:,}건" for k in ("new", "changed", "removed"))
+
+# ---- 모니터링 프로필 (저장/예약 실행) ----
+SCHEDULER_TICK = 30
+
+def _cron_values(field, lo, hi):
+    """cron 필드 하나('*', '1-5', '*/10', '0,30' 등) → 허용 값 집합"""
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/", 1)
+            step = int(step)
+        if part == "*":
+            a, b = lo, hi
+        elif "-" in part:
+            a, b = (int(x) for x in part.split("-", 1))
+        else:
+            a = int(part)
+            b = hi if step > 1 else a
+        if not (lo <= a <= b <= hi) or step < 1:
+            raise ValueError(f"cron 값 범위 오류: {field}")
+        values.update(range(a, b + 1, step))
+    return values
+
+def cron_match(expr, dt):
+    """'분 시 일 월 요일' 형식 cron 식이 dt(분 단위)에 해당하는지 (요일 0/7=일요일)"""
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError("cron 형식은 '분 시 일 월 요일' 5개 필드입니다.")
+    minute, hour, day, month, dow = fields
+    day_ok = dt.day in _cron_values(day, 1, 31)
+    dow_ok = dt.isoweekday() % 7 in {v % 7 for v in _cron_values(dow, 0, 7)}
+    # 일/요일이 모두 지정되면 둘 중 하나만 맞아도 실행 (표준 cron 규칙)
+    if day != "*" and dow != "*":
+        date_ok = day_ok or dow_ok
+    else:
+        date_ok = day_ok and dow_ok
+    return (
+        dt.minute in _cron_values(minute, 0, 59)
+        and dt.hour in _cron_values(hour, 0, 23)
+        and dt.month in _cron_values(month, 1, 12)
+        and date_ok
+    )
+
+def save_profile(name, keywords, reports, listing, start_y, end_y, recipient, api_key, cron, corp_codes=None):
+    cron_match(cron, datetime.now(KST))  # 형식 검증
+    with db_conn() as conn:
+        conn.execute(
+            "INSERT INTO profiles (name, keywords, reports, listing, corp_codes, start_y, end_y, recipient, api_key, cron, enabled, created_at) "
+            "VALUES (?,?,?,?,?,?,?,?,?,?,1,?) "
+            "ON CONFLICT(name) DO UPDATE SET keywords=excluded.keywords, reports=excluded.reports, "
+            "listing=excluded.listing, corp_codes=excluded.corp_codes, start_y=excluded.start_y, end_y=excluded.end_y, "
+            "recipient=excluded.recipient, api_key=excluded.api_key, cron=excluded.cron, watermark=NULL",
+            (name, keywords, json.dumps(reports), json.dumps(listing, ensure_ascii=False),
+             json.dumps(corp_codes) if corp_codes is not None else None,
+             start_y, end_y, recipient, api_key, cron, datetime.now(KST).isoformat())
+        )
+
+def load_profiles(enabled_only=False):
+    with db_conn() as conn:
+        sql = "SELECT * FROM profiles" + (" WHERE enabled=1" if enabled_only else "") + " ORDER BY name"
+        return [dict(r) for r in conn.execute(sql)]
+
+def update_profile(name, **fields):
+    with db_conn() as conn:
+        conn.execute(
+            f"UPDATE profiles SET {', '.join(f'{k}=?' for k in fields)} WHERE name=?",
+            (*fields.values(), name)
+        )
+
+def delete_profile(name):
+    with db_conn() as conn:
+        conn.execute("DELETE FROM profiles WHERE name=?", (name,))
+
+def claim_profile_run(name, started):
+    """프로필 상태를 'running'으로 바꾸고 실행권 획득 (이미 실행 중이면 False)"""
+    with db_conn() as conn:
+        cur = conn.execute(
+            "UPDATE profiles SET last_run=?, last_status='running' "
+            "WHERE name=? AND COALESCE(last_status, '')!='running'",
+            (started.isoformat(), name)
+        )
+        return cur.rowcount == 1
+
+def run_profile(profile):
+    """저장된 프로필 1회 실행 (백그라운드용, 워터마크 이후 새 정기공시만 조회)
+
+    같은 프로필이 이미 실행 중이면(예약 실행과 '지금 실행'이 겹친 경우) 건너뛴다.
+    → 실행했으면 True
+    """
+    name = profile["name"]
+    run_started = datetime.now(KST)
+    if not claim_profile_run(name, run_started):
+        log.info("이미 실행 중인 프로필 건너뜀: %s", name)
+        return False
+    try:
+        _run_profile(profile, run_started)
     except Exception as e:
-        return False, f"메일 발송 실패: {str(e)}"
+        log.exception("프로필 실행 실패: %s", name)
+        update_profile(name, last_status=f"failed: {e}")
+    return True
+
+def _run_profile(profile, run_started):
+    name = profile["name"]
+    key = profile["api_key"]
+    kws = [w.strip() for w in profile["keywords"].split(",") if w.strip()]
+    reports = json.loads(profile["reports"])
+    listing = json.loads(profile["listing"])
+    corp_codes = json.loads(profile["corp_codes"]) if profile.get("corp_codes") else None
+    years = range(profile["start_y"], profile["end_y"] + 1)
+    job_id = f"{name}-{run_started.strftime('%Y%m%d-%H%M%S-%f')}"
+
+    corps, err = load_corp_list(key)
+    if not corps:
+        update_profile(name, last_status=f"failed: {err}")
+        return
+    if corp_codes is not None:
+        wanted = set(corp_codes)
+        corp_map = {c["corp_code"]: c for c in corps if c["corp_code"] in wanted}
+    else:
+        corp_map = {c["corp_code"]: c for c in filter_corps(corps, listing)}
+
+    # 워터마크가 있으면 그 이후 접수된 정기공시에 해당하는 (회사, 연도, 보고서)만 조회
+    scope = None
+    if profile["watermark"]:
+        filings, err, _ = fetch_periodic_filings(key, profile["watermark"], run_started.strftime("%Y%m%d"))
+        if err:
+            update_profile(name, last_status=f"failed: {err}")
+            return
+        keys = sorted({
+            (f["corp_code"], y, r)
+            for f in filings if f.get("corp_code") in corp_map
+            for y, r in filing_targets(f.get("report_nm"))
+            if y in years and r in reports
+        })
+        targets = [(corp_map[code], y, r) for code, y, r in keys]
+        target_count = len(targets)
+        scope = {(code, y, REPORTS[r]) for code, y, r in keys}
+    else:
+        targets = iter_targets(list(corp_map.values()), years, reports)
+        target_count = len(corp_map) * len(years) * len(reports)
+
+    # 조회 → 매칭 → 결과 저장소 (UI 실행과 같은 스트리밍 파이프라인)
+    completed = False
+    for corp, y, rpt, rows, err in stream_fetch_results(key, targets):
+        if err == "API_LIMIT_EXCEEDED":
+            break
+        if err:
+            record_failed_target(job_id, corp, y, rpt, err)
+        else:
+            append_results(job_id, match_rows(corp, y, rpt, rows, kws))
+    else:
+        completed = True
+
+    # 모든 대상을 조회한 경우에만 삭제 판정/스냅샷 저장
+    profile_id = make_profile_id(kws, reports, listing, corp_codes)
+    delta, has_baseline = diff_against_snapshot(profile_id, job_id, years, partial=not completed, scope=scope)
+    if not completed:
+        # 워터마크를 옮기지 않으므로 다음 실행에서 같은 구간을 다시 조회
+        update_profile(name, last_status=f"stopped: API 한도 초과 ({target_count:,}건 중 일부만 조회)")
+        return
+    save_snapshot(profile_id, job_id)
+    update_profile(
+        name, watermark=run_started.strftime("%Y%m%d"),
+        last_status=f"completed: 조회 {target_count:,}건 · {delta_summary(delta)}"
+    )
+
+    # 변경분이 있을 때만 메일 발송 (최초 실행은 전체가 신규)
+    if sum(delta.values()):
+        enqueue_email(
+            to_email=profile["recipient"],
+            subject=f"[DART] 예약 모니터링 '{name}' 변경분 ({delta_summary(delta)})",
+            body=f"""
+프로필: {name}
+실행시간: {run_started.strftime('%Y-%m-%d %H:%M:%S')}
+검색 키워드: {profile['keywords']}
+검색 범위: {profile['start_y']}-{profile['end_y']}년
+보고서 종류: {', '.join(REPORTS[r] for r in reports)}
+조회 방식: {'증분 (' + profile['watermark'] + ' 이후 공시)' if scope is not None else '전체'}
+조회 건수: {target_count:,}건
+{f"이전 실행 대비 변경분: {delta_summary(delta)}" if has_baseline else "이전 실행 기록 없음 (최초 실행)"}
+
+첨부된 Excel 파일을 확인하세요.
+""",
+            attachment_bytes=export_delta_xlsx(job_id),
+            filename=f"dart_delta_{job_id}.xlsx"
+        )
+
+def scheduler_loop():
+    """1분 단위로 활성 프로필의 cron 식을 확인해 실행 (프로필마다 별도 스레드)"""
+    last_tick = None
+    while True:
+        try:
+            now = datetime.now(KST).replace(second=0, microsecond=0)
+            if now != last_tick:
+                for profile in load_profiles(enabled_only=True):
+                    try:
+                        due = cron_match(profile["cron"], now)
+                    except ValueError:
+                        continue
+                    if due and (profile["last_run"] or "")[:16] != now.isoformat()[:16]:
+                        # 실행이 오래 걸려도 다른 프로필의 예약 시각을 놓치지 않도록 각각 별도 스레드로
+                        # (같은 프로필이 이미 실행 중이면 run_profile이 건너뜀)
+                        threading.Thread(
+                            target=run_profile, args=(profile,), daemon=True, name=f"dart-profile-{profile['name']}"
+                        ).start()
+                # 목록 조회 중 오류가 나면 같은 분 안에서 다시 확인 (이미 시작한 프로필은 last_run으로 건너뜀)
+                last_tick = now
+        except Exception:
+            log.exception("예약 실행 루프 오류 (%s초 후 재시도)", LOOP_ERROR_SLEEP)
+            time.sleep(LOOP_ERROR_SLEEP)
+            continue
+        time.sleep(SCHEDULER_TICK)
+
+@st.cache_resource
+def start_scheduler():
+    """예약 실행 스레드 시작 (앱 프로세스당 1개)"""
+    # 이전 프로세스에서 실행 중 중단된 프로필 상태 정리
+    with db_conn() as conn:
+        conn.execute("UPDATE profiles SET last_status='stopped: 앱 재시작' WHERE last_status='running'")
+    thread = threading.Thread(target=scheduler_loop, daemon=True, name="dart-scheduler")
+    thread.start()
+    return thread
+
+start_scheduler()
+
+def apply_profile_to_form(profile):
+    """프로필 값을 검색 폼 입력값으로 불러오기 (버튼 콜백)"""
+    st.session_state.email_input = profile["recipient"]
+    st.session_state.keywords_input = profile["keywords"]
+    st.session_state.reports_input = json.loads(profile["reports"])
+    st.session_state.listing_input = json.loads(profile["listing"]) or ["상장사"]
+    if profile.get("corp_codes"):
+        st.session_state.scope_input = SCOPE_WATCHLIST
+        st.session_state.watchlist_input = "\n".join(json.loads(profile["corp_codes"]))
+    else:
+        st.session_state.scope_input = SCOPE_ALL
+    st.session_state.years_input = (profile["start_y"], min(profile["end_y"], cy))
+
+with st.expander("🗂️ 모니터링 프로필 / 예약 실행"):
+    st.caption("현재 검색 조건(수신 이메일·키워드·보고서·회사 구분 또는 관심 회사·연도)과 선택된 API 키를 프로필로 저장하면, "
+               "실행 주기에 맞춰 백그라운드에서 자동 실행되고 변경분만 메일로 발송됩니다. "
+               "두 번째 실행부터는 마지막 실행일 이후 접수된 정기공시만 조회합니다.")
+    col_pname, col_pcron = st.columns([1, 1])
+    profile_name = col_pname.text_input("프로필 이름", key="profile_name_input")
+    profile_cron = col_pcron.text_input(
+        "실행 주기 (cron: 분 시 일 월 요일)", value="0 8 * * 1-5", key="profile_cron_input",
+        help="예) '0 8 * * 1-5' 평일 오전 8시, '30 7 * * *' 매일 7시 30분, '0 9 1 * *' 매월 1일 9시 (KST)"
+    )
+    if st.button("💾 현재 조건으로 프로필 저장", key="save_profile_btn"):
+        if not profile_name.strip():
+            st.error("프로필 이름을 입력하세요.")
+        elif not is_valid_email(recipient):
+            st.error("유효한 이메일 주소를 입력하세요.")
+        elif not sel_reports or not (listing or watch_codes):
+            st.error("보고서 종류와 회사 구분(또는 관심 회사)을 하나 이상 선택하세요.")
+        else:
+            try:
+                save_profile(profile_name.strip(), keywords, sel_reports, listing,
+                             start_y, end_y, recipient, corp_key, profile_cron.strip(), watch_codes)
+                st.success(f"프로필 '{profile_name.strip()}' 저장 완료")
+            except ValueError as e:
+                st.error(f"실행 주기 형식 오류: {e}")
+
+    profiles = load_profiles()
+    if profiles:
+        st.dataframe(pd.DataFrame([{
+            "이름": p["name"],
+            "키워드": p["keywords"],
+            "보고서": ",".join(REPORTS[r] for r in json.loads(p["reports"])),
+            "대상": f"지정 {len(json.loads(p['corp_codes'])):,}개사" if p["corp_codes"] else ",".join(json.loads(p["listing"])),
+            "연도": f"{p['start_y']}-{p['end_y']}",
+            "수신": p["recipient"],
+            "API": f"{p['api_key'][:8]}...",
+            "주기": p["cron"],
+            "사용": "✅" if p["enabled"] else "⏸️",
+            "워터마크": p["watermark"] or "",
+            "마지막 실행": p["last_run"] or "",
+            "상태": p["last_status"] or "",
+        } for p in profiles]), use_container_width=True, hide_index=True)
+
+        profile_by_name = {p["name"]: p for p in profiles}
+        sel_profile = st.selectbox("프로필 선택", list(profile_by_name), key="profile_select")
+        selected = profile_by_name[sel_profile]
+        col_p1, col_p2, col_p3, col_p4 = st.columns(4)
+        col_p1.button("📂 불러오기", key="load_profile_btn",
+                      on_click=apply_profile_to_form, args=(selected,))
+        if col_p2.button("⏸️ 중지" if selected["enabled"] else "▶️ 사용", key="toggle_profile_btn"):
+            update_profile(sel_profile, enabled=0 if selected["enabled"] else 1)
+            st.rerun()
+        if col_p3.button("🚀 지금 실행", key="run_profile_btn"):
+            if selected["last_status"] == "running":
+                st.warning(f"프로필 '{sel_profile}'이(가) 이미 실행 중입니다. 완료 후 다시 실행하세요.")
+            else:
+                # 그 사이 예약 실행이 먼저 시작되면 run_profile이 건너뜀
+                threading.Thread(target=run_profile, args=(selected,), daemon=True).start()
+                st.success(f"프로필 '{sel_profile}' 백그라운드 실행을 시작했습니다. 상태는 새로고침 후 확인하세요.")
+        if col_p4.button("🗑️ 삭제", key="delete_profile_btn"):
+            delete_profile(sel_profile)
+            st.rerun()
 
 # ---- 이전 결과 표시 (새 작업 시작 전에도 보여주기) ----
-if 'monitoring_results' in st.session_state and st.session_state.monitoring_results:
+prev_job_id = st.session_state.get('current_job_id')
+prev_count = count_results(prev_job_id) if prev_job_id else 0
+# 같은 작업을 이어받는 중이면 아래 모니터링 결과에서 표시
+if prev_count and st.session_state.get("resume_job_id") != prev_job_id:
     st.markdown("---")
     st.markdown("### 📊 이전 검색 결과")
     
-    prev_df = pd.DataFrame(st.session_state.monitoring_results)
-    st.success(f"💾 저장된 결과: {len(prev_df):,}건 (작업ID: {st.session_state.get('current_job_id', 'Unknown')})")
-    st.dataframe(prev_df, use_container_width=True)
-    
-    # 이전 결과 다운로드 버튼 (항상 사용 가능) - 3개 버튼으로 구성
-    prev_buf = io.BytesIO()
-    with pd.ExcelWriter(prev_buf, engine="openpyxl") as w:
-        prev_df.to_excel(w, index=False, sheet_name="DART_Results")
-    prev_excel_data = prev_buf.getvalue()
+    st.success(f"💾 저장된 결과: {prev_count:,}건 (작업ID: {prev_job_id})")
+    render_results_view(prev_job_id, key=f"results_{prev_job_id}")
     
+    # 이전 결과 다운로드 버튼 (항상 사용 가능, 파일은 요청 시 생성) - 3개 버튼으로 구성
+    # 실행 직후 화면과 같은 키를 써서 그 화면에서 누른 "파일 준비"가 다음 실행에서도 처리되게 한다
     col_download, col_email, col_clear = st.columns([1, 1, 1])
     with col_download:
-        st.download_button(
-            "📥 저장된 결과 다운로드", 
-            data=prev_excel_data,
-            file_name=f"dart_results_{st.session_state.get('current_job_id', 'saved')}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="download_saved_results"
-        )
+        render_export_download(prev_job_id, prev_count, "📥 저장된 결과 다운로드", key=f"download_{prev_job_id}")
     
     with col_email:
         if st.button("📧 저장된 결과 메일 발송", key="email_saved_results"):
             if not is_valid_email(recipient):
                 st.error("유효한 이메일 주소를 입력하세요.")
             else:
-                email_subject = f"[DART] 저장된 모니터링 결과 ({st.session_state.get('current_job_id', 'saved')})"
+                email_subject = f"[DART] 저장된 모니터링 결과 ({prev_job_id})"
                 email_body = f"""
 저장된 DART 모니터링 결과를 발송합니다.
 
-작업ID: {st.session_state.get('current_job_id', 'saved')}
-결과 건수: {len(prev_df):,}건
+작업ID: {prev_job_id}
+결과 건수: {prev_count:,}건
 발송 시간: {datetime.now(KST).strftime('%Y-%m-%d %H:%M:%S')}
 
 첨부된 Excel 파일을 확인하세요.
 """
                 
-                with st.spinner("메일 발송 중..."):
-                    success, msg = send_email(
-                        to_email=recipient,
-                        subject=email_subject,
-                        body=email_body,
-                        attachment_bytes=prev_excel_data,
-                        filename=f"dart_results_{st.session_state.get('current_job_id', 'saved')}.xlsx"
-                    )
-                
-                if success:
-                    st.success(f"✅ 저장된 결과가 {recipient}로 발송되었습니다!")
-                else:
-                    st.error(f"❌ 메일 발송 실패: {msg}")
+                with st.spinner("첨부 파일 생성 중…"):
+                    prev_excel_data = read_export(export_results_file(prev_job_id, prev_count))
+                job_ids = enqueue_email(
+                    to_email=recipient,
+                    subject=email_subject,
+                    body=email_body,
+                    attachment_bytes=prev_excel_data,
+                    filename=f"dart_results_{prev_job_id}.xlsx"
+                )
+                st.success(f"📮 저장된 결과 메일이 발송 대기열에 등록되었습니다 ({recipient}, 작업 {', '.join(f'#{j}' for j in job_ids)})")
     
     with col_clear:
         if st.button("🗑️ 저장된 결과 삭제", key="clear_saved_results"):
-            st.session_state.monitoring_results = []
-            if 'current_job_id' in st.session_state:
-                del st.session_state.current_job_id
+            clear_results(prev_job_id)
+            del st.session_state.current_job_id
             st.success("저장된 결과가 삭제되었습니다.")
             st.rerun()
 
+# ---- 메일 발송 현황 ----
+with st.expander("📮 메일 발송 현황"):
+    mail_df = mail_status_frame()
+    if mail_df.empty:
+        st.caption("발송 기록이 없습니다.")
+    else:
+        st.dataframe(mail_df, use_container_width=True, hide_index=True)
+        if (mail_df["상태"] == MAIL_STATUS_LABELS["failed"]).any():
+            if st.button("🔁 실패한 메일 다시 발송", key="retry_failed_mail"):
+                retry_failed_mail_jobs()
+                st.rerun()
+
 # ---- 진행률 바/진행상태 (모니터링 시작 시에만 표시) ----
 prog_placeholder = st.empty()
 status_placeholder = st.empty()
@@ -526,44 +2085,62 @@ if st.session_state.get("running", False) or st.session_state.get("resume_job_id
     loading_placeholder.empty()
 
     kws = [w.strip() for w in keywords.split(",") if w.strip()]
-    all_c = [
-        c for c in corps
-        if ((c["stock_code"] and "상장사" in listing)
-            or (not c["stock_code"] and "비상장사" in listing))
-    ]
+    all_c = watch_corps if watch_corps is not None else filter_corps(corps, listing)
+    years = range(start_y, end_y+1)
     
-    targets = [
-        (c, y, r)
-        for c in all_c
-        for y in range(start_y, end_y+1)
-        for r in sel_reports
-    ]
-    
-    N = len(targets)
-    st.success(f"총 호출 대상: {N:,}건")
+    if fetch_mode == MODE_DOCUMENT:
+        # 공시원문 일괄 수집 (이미 받은 원문은 건너뜀) → 로컬에 저장된 임원 현황 표에서 매칭
+        def show_ingest_progress(done, total):
+            prog_placeholder.progress(done / total, text=f"📥 공시원문 수집: {done:,}/{total:,}건")
+        
+        with st.spinner("정기보고서 공시 목록 조회 및 원문 수집 중…"):
+            doc_targets, doc_calls, doc_err = prepare_document_targets(
+                corp_key, all_c, years, sel_reports, show_ingest_progress
+            )
+        st.session_state.api_call_count = st.session_state.get('api_call_count', 0) + doc_calls
+        update_api_usage(corp_key, doc_calls)
+        
+        if doc_err:
+            st.session_state.running = False
+            job_row = jobs_ws.find(job_id, in_column=1)
+            if job_row:
+                jobs_ws.update_cell(job_row.row, 4, "stopped" if doc_err == "API_LIMIT_EXCEEDED" else "failed")
+            if doc_err == "API_LIMIT_EXCEEDED":
+                st.error("🚫 API 일일 한도 초과로 원문 수집이 중단되었습니다. 수집된 원문은 저장되어 있으니 다른 API 키로 이어받기를 진행하세요.")
+            else:
+                st.error(f"공시원문 수집 실패: {doc_err}")
+            st.session_state.pop("resume_job_id", None)
+            st.session_state.pop("resume_data", None)
+            st.stop()
+        
+        N = len(doc_targets)
+        st.success(f"총 조회 대상 (수집된 정기보고서): {N:,}건 · 원문 수집 API 호출 {doc_calls:,}회")
+    else:
+        # 조회 대상은 목록으로 만들지 않고 생성기로 흘려보냄
+        N = len(all_c) * len(years) * len(sel_reports)
+        st.success(f"총 호출 대상: {N:,}건")
     
-    # 결과를 세션 상태에 저장 (다운로드 후에도 유지)
-    if 'monitoring_results' not in st.session_state:
-        st.session_state.monitoring_results = []
-    if 'current_job_id' not in st.session_state:
-        st.session_state.current_job_id = job_id
+    # 매칭 결과는 작업ID별로 결과 저장소에 바로 기록 (이어받기 시 같은 작업ID에 이어서 기록)
+    st.session_state.current_job_id = job_id
     
-    # 이어받기 모드인 경우 이전 결과 복원
-    if is_resume and st.session_state.get("resume_data") and 'resume_results' in st.session_state.resume_data:
-        st.session_state.monitoring_results = st.session_state.resume_data['resume_results']
-        results = st.session_state.monitoring_results.copy()
-    else:
-        # 새 작업 시작 시 이전 결과 초기화
-        if st.session_state.current_job_id != job_id:
-            st.session_state.monitoring_results = []
-            st.session_state.current_job_id = job_id
-        results = st.session_state.monitoring_results.copy()
+    # 이어받기 모드인 경우 저장소에 기록된 진행 위치부터 시작
+    start_index = 0
+    if is_resume:
+        saved_index = load_job_progress(job_id)
+        if saved_index is None:
+            # 진행 위치가 없는 작업은 처음부터 다시 (앞서 기록된 결과가 중복되지 않도록 비우고 시작)
+            clear_results(job_id)
+        else:
+            start_index = min(saved_index, N)
+    match_count = count_results(job_id)
     start_time = datetime.now()
     api_limit_hit = False
+    completed = False
     
     # 진행률 초기화
     st.session_state.total_count = N
-    st.session_state.current_count = 0
+    st.session_state.current_count = start_index
+    st.session_state.progress = start_index / N if N > 0 else 0
     
     # 진행률바 표시 시작 (API 호출 횟수 포함)
     prog_placeholder.markdown("<div class='progress-container'>", unsafe_allow_html=True)
@@ -580,30 +2157,29 @@ if st.session_state.get("running", False) or st.session_state.get("resume_job_id
         unsafe_allow_html=True
     )
     
-    # 이어받기 모드인 경우 시작 인덱스 설정
-    start_index = 0
-    if is_resume and st.session_state.get("resume_data"):
-        # 이어받기 데이터에서 이전 진행 상황 복원
-        resume_data = st.session_state.resume_data
-        if 'resume_progress' in resume_data:
-            start_index = int(resume_data.get('resume_progress', 0))
-            st.session_state.current_count = start_index
-            st.session_state.progress = start_index / N if N > 0 else 0
-    
-    for i, (corp, y, rpt) in enumerate(targets[start_index:], start_index + 1):
+    if fetch_mode == MODE_DOCUMENT:
+        fetched = stream_document_results(doc_targets[start_index:])
+    else:
+        fetched = stream_fetch_results(corp_key, iter_targets(all_c, years, sel_reports, start_index))
+    for i, (corp, y, rpt, rows, err) in enumerate(fetched, start_index + 1):
         # 중지 버튼 체크 (이어받기 모드에서도 작동하도록)
         if not st.session_state.get("running", False):
             break
         
-        # 진행률 및 상태 업데이트 (호출 전에 먼저 업데이트)
+        # API 호출 카운트/사용량 업데이트 (조회는 백그라운드 스레드에서 수행)
+        if fetch_mode == MODE_API:
+            st.session_state.api_call_count = st.session_state.get('api_call_count', 0) + 1
+            update_api_usage(corp_key)
+        
+        # 진행률 및 상태 업데이트
         st.session_state.current_count = i
         st.session_state.progress = i / N
         
         elapsed = (datetime.now() - start_time).total_seconds()
-        speed = i / elapsed if elapsed > 0 else 1
+        speed = (i - start_index) / elapsed if elapsed > 0 else 1
         eta = int((N-i) / speed) if speed > 0 else 0
         
-        # 진행률바 업데이트 (호출 전에 먼저 표시)
+        # 진행률바 업데이트
         prog_placeholder.progress(
             st.session_state.progress, 
             text=f"📊 API 호출: {st.session_state.get('api_call_count', 0):,}/20,000 | 진행: {i:,}/{N:,} ({st.session_state.progress*100:.0f}%) | 남은시간: {eta//60}분 {eta%60}초"
@@ -618,22 +2194,17 @@ if st.session_state.get("running", False) or st.session_state.get("resume_job_id
             unsafe_allow_html=True
         )
         
-        rows, err = fetch_execs(corp_key, corp["corp_code"], y, rpt)
-        
         # API 한도 초과 감지
         if err == "API_LIMIT_EXCEEDED":
             api_limit_hit = True
             st.session_state.running = False
             
-            # 현재까지의 진행 상황을 세션에 저장 (이어받기용)
-            st.session_state.resume_progress = i - 1
-            st.session_state.resume_results = results.copy()
-            
+            # 이어받기 위치(i-1)는 결과와 함께 저장소에 이미 기록됨
             # 현재까지의 진행 상황 저장
             prog_ws.append_row([
                 job_id, f"{i-1}/{N}", f"{start_y}-{end_y}", 
                 ",".join(REPORTS[r] for r in sel_reports), 
-                datetime.now(KST).isoformat(), len(results)
+                datetime.now(KST).isoformat(), match_count
             ])
             
             # 작업 상태를 stopped로 변경
@@ -646,38 +2217,29 @@ if st.session_state.get("running", False) or st.session_state.get("resume_job_id
                 "<div class='api-limit-warning'>"
                 f"⚠️ <b>API 한도 초과 안내</b><br>"
                 f"• 현재까지 처리: {i-1:,}/{N:,}건<br>"
-                f"• 매칭된 결과: {len(results):,}건<br>"
+                f"• 매칭된 결과: {match_count:,}건<br>"
                 f"• 다른 API 키로 변경 후 '이어받기' 버튼을 클릭하세요."
                 "</div>", 
                 unsafe_allow_html=True
             )
             break
         
-        if err and err != "API_LIMIT_EXCEEDED":
+        if err:
+            # 조회 실패 대상은 변경분 계산 시 이전 결과를 삭제로 보지 않도록 기록
+            record_failed_target(job_id, corp, y, rpt, err, done=i)
             continue
         
-        # 결과 수집 및 세션 상태에 저장
-        for r in rows:
-            mc = r.get("main_career", "")
-            if any(k in mc for k in kws):
-                new_result = {
-                    "회사명":     corp["corp_name"],
-                    "종목코드":   corp["stock_code"] or "비상장",
-                    "사업연도":   y,
-                    "보고서종류": REPORTS[rpt],
-                    "임원이름":   r.get("nm",""),
-                    "직위":       r.get("ofcps",""),
-                    "주요경력":   mc,
-                    "매칭키워드": ",".join([k for k in kws if k in mc])
-                }
-                results.append(new_result)
-                st.session_state.monitoring_results.append(new_result)
-        
-        # 잠시 쉬기 (API 호출 제한 준수, 진행률바 업데이트를 위해 짧게)
-        time.sleep(0.05)
+        # 매칭 결과는 바로 저장소에 기록 (진행 위치와 함께)
+        matched = match_rows(corp, y, rpt, rows, kws)
+        append_results(job_id, matched, done=i)
+        match_count += len(matched)
+    else:
+        # 중간에 멈추지 않고 모든 대상을 처리함
+        completed = True
+    fetched.close()
     
-    # API 한도 초과가 아닌 경우에만 완료 처리
-    if not api_limit_hit:
+    # 모든 대상을 처리한 경우에만 완료 처리
+    if completed:
         st.session_state.running = False
         st.session_state.progress = 1.0
         
@@ -696,63 +2258,72 @@ if st.session_state.get("running", False) or st.session_state.get("resume_job_id
         prog_ws.append_row([
             job_id, N, f"{start_y}-{end_y}", 
             ",".join(REPORTS[r] for r in sel_reports), 
-            ts1, len(results)
+            ts1, match_count
         ])
         
         status = "completed"
         job_row = jobs_ws.find(job_id, in_column=1)
         if job_row:
             jobs_ws.update_cell(job_row.row, 4, status)
+    elif not api_limit_hit:
+        # 중지 버튼 등으로 중간에 멈춤: 진행 위치는 저장소에 있으므로 이어받기 가능한 상태로
+        st.session_state.running = False
+        done_count = st.session_state.get("current_count", start_index)
+        status_placeholder.markdown(
+            f"<div style='background:#fff8e1;border-radius:8px;padding:12px;margin:10px 0;border:1px solid #ffb300;'>"
+            f"⏹️ <strong>모니터링 중지</strong> {done_count:,}/{N:,}건 처리 · '이어서 복구/재시작'으로 계속할 수 있습니다."
+            f"</div>", 
+            unsafe_allow_html=True
+        )
+        prog_ws.append_row([
+            job_id, f"{done_count}/{N}", f"{start_y}-{end_y}", 
+            ",".join(REPORTS[r] for r in sel_reports), 
+            datetime.now(KST).isoformat(), match_count
+        ])
+        job_row = jobs_ws.find(job_id, in_column=1)
+        if job_row:
+            jobs_ws.update_cell(job_row.row, 4, "stopped")
 
     # --- 결과 처리 (완료 또는 중단 모두) ---
-    # 최종 결과는 세션에서 가져오기
-    final_results = st.session_state.monitoring_results
-    df = pd.DataFrame(final_results)
+    # 이전 실행 스냅샷 대비 변경분 계산 (모든 대상을 처리했을 때만 삭제 판정·스냅샷 갱신)
+    profile_id = make_profile_id(kws, sel_reports, listing, watch_codes, fetch_mode == MODE_DOCUMENT)
+    delta, has_baseline = diff_against_snapshot(profile_id, job_id, years, partial=not completed)
+    if completed:
+        save_snapshot(profile_id, job_id)
+    delta_count = sum(delta.values())
+    if has_baseline:
+        st.info(f"🆕 이전 실행 대비 변경분: {delta_summary(delta)}")
     
-    if df.empty and not api_limit_hit:
+    if match_count == 0 and completed:
         st.info("🔍 매칭 결과 없음.")
-        # 빈 결과도 메일로 알림
-        email_subject = f"[DART] {start_y}-{end_y}년 {','.join(REPORTS[r] for r in sel_reports)} 모니터링 결과 (결과 없음)"
-        email_body = f"""
-작업ID: {job_id}
-시작시간: {datetime.now(KST).strftime('%Y-%m-%d %H:%M:%S')}
-검색 키워드: {keywords}
-검색 범위: {start_y}-{end_y}년
-보고서 종류: {', '.join(REPORTS[r] for r in sel_reports)}
-총 호출 건수: {st.session_state.get('api_call_count', 0):,}회
-매칭 결과: 0건
-
-검색 조건에 맞는 결과가 없습니다.
-"""
-        success, msg = send_email(recipient, email_subject, email_body)
-        if success:
-            st.success(f"결과 없음 알림을 {recipient}로 발송했습니다.")
-        else:
-            st.error(f"메일 발송 실패: {msg}")
-            
-    elif len(df) > 0:
-        st.success(f"총 {len(df):,}건 매칭 완료")
-        st.dataframe(df, use_container_width=True)
+    elif match_count > 0:
+        st.success(f"총 {match_count:,}건 매칭 완료")
+        render_results_view(job_id, key=f"results_{job_id}")
         
-        # Excel 파일 생성
-        buf = io.BytesIO()
-        with pd.ExcelWriter(buf, engine="openpyxl") as w:
-            df.to_excel(w, index=False, sheet_name="DART_Results")
-        excel_data = buf.getvalue()
-        
-        # 다운로드 버튼 (결과 리셋 방지)
-        st.download_button(
-            "📥 XLSX 다운로드", 
-            data=excel_data,
-            file_name=f"dart_results_{job_id}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key=f"download_{job_id}"
-        )
-        
-        # **핵심: 자동 메일 발송**
+        # 전체 결과를 메일에 첨부할 때만 파일을 바로 생성 (그 외에는 요청 시 생성)
+        if not delta_only:
+            with st.spinner("XLSX 파일 생성 중…"):
+                export_results_file(job_id, match_count)
+        render_export_download(job_id, match_count, "📥 XLSX 다운로드", key=f"download_{job_id}")
+    
+    # **핵심: 자동 메일 발송** (중간에 멈췄는데 결과도 없으면 생략)
+    if not (match_count == 0 and not completed):
         email_subject = f"[DART] {start_y}-{end_y}년 {','.join(REPORTS[r] for r in sel_reports)} 모니터링 결과"
+        status_text = "완료" if completed else "일시중단 (API 한도 초과)" if api_limit_hit else "중지"
         
-        status_text = "완료" if not api_limit_hit else "일시중단 (API 한도 초과)"
+        if delta_only:
+            # 변경분만 첨부 (최초 실행이면 전체가 신규)
+            attachment = export_delta_xlsx(job_id) if delta_count else None
+            filename = f"dart_delta_{job_id}.xlsx"
+            if delta_count == 0:
+                email_subject += " (변경 없음)"
+            elif has_baseline:
+                email_subject += " (변경분)"
+        else:
+            attachment = read_export(export_results_file(job_id, match_count)) if match_count else None
+            filename = f"dart_results_{job_id}.xlsx"
+            if match_count == 0:
+                email_subject += " (결과 없음)"
         
         email_body = f"""
 작업ID: {job_id}
@@ -761,46 +2332,31 @@ if st.session_state.get("running", False) or st.session_state.get("resume_job_id
 검색 키워드: {keywords}
 검색 범위: {start_y}-{end_y}년
 보고서 종류: {', '.join(REPORTS[r] for r in sel_reports)}
+조회 방식: {fetch_mode}
 총 호출 건수: {st.session_state.get('api_call_count', 0):,}회
-매칭 결과: {len(results):,}건
+매칭 결과: {match_count:,}건
+{f"이전 실행 대비 변경분: {delta_summary(delta)}" if has_baseline else "이전 실행 기록 없음 (최초 실행)"}
 
-{'첨부된 Excel 파일을 확인하세요.' if len(results) > 0 else ''}
+{'첨부된 Excel 파일을 확인하세요.' if attachment else '검색 조건에 맞는 결과가 없습니다.' if match_count == 0 else '이전 실행 대비 변경된 결과가 없습니다.'}
 {'API 한도 초과로 작업이 중단되었습니다. 다른 API 키로 이어받기를 진행하세요.' if api_limit_hit else ''}
 """
         
-        # 자동 메일 발송
-        success, msg = send_email(
+        # 자동 메일 발송 (백그라운드 대기열)
+        job_ids = enqueue_email(
             to_email=recipient,
             subject=email_subject,
             body=email_body,
-            attachment_bytes=excel_data,
-            filename=f"dart_results_{job_id}.xlsx"
+            attachment_bytes=attachment,
+            filename=filename
+        )
+        st.markdown(
+            f"<div class='success-box'>"
+            f"📮 <b>결과 메일이 {recipient} 앞으로 발송 대기열에 등록되었습니다.</b><br>"
+            f"📧 제목: {email_subject} (작업 {', '.join(f'#{j}' for j in job_ids)})<br>"
+            f"<span style='font-size:13px;color:#666;'>발송 상태는 '📮 메일 발송 현황'에서 확인할 수 있습니다. 실패 시 자동으로 재시도합니다.</span>"
+            f"</div>", 
+            unsafe_allow_html=True
         )
-        
-        if success:
-            st.markdown(
-                f"<div class='success-box'>"
-                f"✅ <b>결과가 자동으로 {recipient}에게 발송되었습니다!</b><br>"
-                f"📧 제목: {email_subject}"
-                f"</div>", 
-                unsafe_allow_html=True
-            )
-        else:
-            st.error(f"❌ 자동 메일 발송 실패: {msg}")
-            
-            # 수동 발송 버튼 제공
-            if st.button("📧 수동 메일 발송 재시도", key=f"manual_send_{job_id}"):
-                success2, msg2 = send_email(
-                    to_email=recipient,
-                    subject=email_subject,
-                    body=email_body,
-                    attachment_bytes=excel_data,
-                    filename=f"dart_results_{job_id}.xlsx"
-                )
-                if success2:
-                    st.success(f"수동 메일 발송 성공: {recipient}")
-                else:
-                    st.error(f"수동 메일 발송도 실패: {msg2}")
 
     # 세션 정리
     if 'resume_job_id' in st.session_state:
@@ -0,0 +1,74 @@
+# 공시원문(document.xml) ZIP에서 임원 현황 표를 추출하는 파서
+# app.py(Streamlit 스크립트)와 분리해 두어야 프로세스 풀에서 함수를 모듈 경로로 불러올 수 있다.
+import io, re, html, zipfile
+
+DOC_EXEC_FIELDS = [
+    ("성명", "nm"), ("성별", "sexdstn"), ("출생년월", "birth_ym"), ("직위", "ofcps"),
+    ("등기임원여부", "rgist_exctv_at"), ("상근여부", "fte_at"), ("담당업무", "chrg_job"),
+    ("주요경력", "main_career"), ("최대주주와의관계", "mxmm_shrholdr_relate"),
+    ("재직기간", "hffc_pd"), ("임기만료일", "tenure_end_on"),
+]
+_TABLE_RE = re.compile(r"<TABLE\b[^>]*>(.*?)</TABLE>", re.S | re.I)
+_ROW_RE = re.compile(r"<TR\b[^>]*>(.*?)</TR>", re.S | re.I)
+_CELL_RE = re.compile(r"<(TD|TH|TE|TU)\b([^>]*)>(.*?)</\1>", re.S | re.I)
+_COLSPAN_RE = re.compile(r"COLSPAN\s*=\s*\"?(\d+)", re.I)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+def _cell_text(raw):
+    text = re.sub(r"<BR\s*/?>", "\n", raw, flags=re.I)
+    text = html.unescape(_TAG_RE.sub("", text))
+    return "\n".join(" ".join(line.split()) for line in text.splitlines() if line.strip())
+
+def _table_rows(table_xml):
+    """표 → [(헤더 셀 여부, [셀 텍스트 …])] (COLSPAN은 같은 값으로 펼침)"""
+    rows = []
+    for row_xml in _ROW_RE.findall(table_xml):
+        cells, is_header = [], True
+        for tag, attrs, raw in _CELL_RE.findall(row_xml):
+            span = _COLSPAN_RE.search(attrs)
+            cells.extend([_cell_text(raw)] * (int(span.group(1)) if span else 1))
+            if tag.upper() != "TH":
+                is_header = False
+        if cells:
+            rows.append((is_header, cells))
+    return rows
+
+def parse_exec_table(zip_bytes):
+    """공시원문 ZIP → 임원 현황 행 목록 (exctvSttus.json 'list'와 같은 키)
+
+    '성명'과 '주요경력' 컬럼이 모두 있는 표를 임원 현황으로 본다.
+    """
+    out = []
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+        # 본문(가장 큰 파일)부터 확인
+        names = sorted(zf.namelist(), key=lambda n: -zf.getinfo(n).file_size)
+        for name in names:
+            raw = zf.read(name)
+            try:
+                doc = raw.decode("utf-8")
+            except UnicodeDecodeError:
+                doc = raw.decode("cp949", errors="ignore")
+            for table_xml in _TABLE_RE.findall(doc):
+                rows = _table_rows(table_xml)
+                if not rows:
+                    continue
+                # TH로 된 첫 행을 헤더로 (TH가 없는 표는 첫 행)
+                header_at = next((i for i, (is_header, _) in enumerate(rows) if is_header), 0)
+                header = rows[header_at][1]
+                keys = ["".join(h.split()) for h in header]
+                col_idx = {}
+                for label, field in DOC_EXEC_FIELDS:
+                    idx = next((i for i, k in enumerate(keys) if label in k), None)
+                    if idx is not None:
+                        col_idx[field] = idx
+                if "nm" not in col_idx or "main_career" not in col_idx:
+                    continue
+                for is_header, cells in rows[header_at + 1:]:
+                    if is_header or len(cells) < len(header):
+                        continue
+                    row = {field: cells[i] for field, i in col_idx.items()}
+                    if row["nm"] and row["nm"] != "-":
+                        out.append(row)
+            if out:
+                return out
+    return out